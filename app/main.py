@@ -1,11 +1,30 @@
 import json
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
+from src.connections import reset_clients
+from src.instrumentation import PROMETHEUS_REGISTRY, prometheus_enabled
+from src.model import SETTINGS
 from src.osu_api import Api
-from src.p03_1_app import BGApp
+from src.request_log import logged_request
+from src.task_runner import TaskRunner
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one Api and task runner per process, the mongoDB client, the S3 resources
+    # and the setting and motor caches are shared by all the requests as well
+    app.state.runner = TaskRunner(Api(), max_workers=SETTINGS.SERVER_WORKERS)
+    try:
+        yield
+    finally:
+        app.state.runner.close()
+        reset_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # Define the Pydantic model for the task payload
@@ -14,20 +33,32 @@ class Event(BaseModel):
     end_ts: int = 1677115068
     asset_id: int = 123456789
     task: str = "return_cache"
+    # calculate_bg_batch: the windows of the assets, the pool size and the task
+    assets: Optional[List[Dict[str, Any]]] = None
+    max_workers: Optional[int] = None
+    incremental: Optional[bool] = None
 
 
 @app.get("/")
-def home():
+async def home():
     return {"health_check": "OK"}
 
 
+@app.get("/metrics")
+async def metrics():
+    # totals of the runs of this process in the Prometheus text format
+    if not prometheus_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(PROMETHEUS_REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/task")
-def task(event: Event):
-    api = Api()
-    event_dict = event.dict()
-    # print(event_dict)
-    obj = BGApp(api, event_dict)
-    returned_value = obj.run()
+async def task(event: Event, request: Request):
+    # the batch fields are passed only if they were set
+    event_dict = event.dict(exclude_none=True)
+    with logged_request("fastapi", event_dict) as logged:
+        # BGApp runs in the runner's threads, see src/task_runner.py
+        returned_value = logged.result = await request.app.state.runner.run(event_dict)
     return returned_value
 
 # here is an example of event in the api
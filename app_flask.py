@@ -1,8 +1,10 @@
 import logging
+from typing import Any, Dict, List, Optional
 from flask import Flask, request, jsonify
 from pydantic import BaseModel
 from src.osu_api import Api
 from src.p03_1_app import BGApp
+from src.request_log import logged_request
 
 app = Flask(__name__)
 
@@ -12,6 +14,10 @@ class Event(BaseModel):
     end_ts: int = 1677115068
     asset_id: int = 123456789
     task: str = "return_cache"
+    # calculate_bg_batch: the windows of the assets, the pool size and the task
+    assets: Optional[List[Dict[str, Any]]] = None
+    max_workers: Optional[int] = None
+    incremental: Optional[bool] = None
 
 @app.route('/')
 def home():
@@ -27,10 +33,12 @@ def task():
 
     logging.info(f"Lambda function executed successfully with event {event}")
     api = Api()
-    event_dict = event.dict()
+    # the batch fields are passed only if they were set
+    event_dict = event.dict(exclude_none=True)
     # print(event_dict)
-    obj = BGApp(api, event_dict)
-    returned_value = obj.run()
+    with logged_request("flask", event_dict) as logged:
+        obj = BGApp(api, event_dict)
+        returned_value = logged.result = obj.run()
     return jsonify(returned_value)
 
 # here is an example of event in the api - fast api
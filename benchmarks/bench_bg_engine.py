@@ -0,0 +1,65 @@
+"""
+Compare the vectorized bit grade engine with the per record implementation.
+The per record path has an O(n^2) cumulative sum, so it is only timed on a
+small window and extrapolated to the engine size.
+
+    python -m benchmarks.bench_bg_engine --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src import bg_engine
+
+BIT_WEAR_CONSTANT = 30_000_000_000_000
+MOTOR_COF = 442.96
+
+
+def per_record_path(wobs, rpms, flowrates):
+    bit_grades = [
+        wob * (rpm + flowrate * MOTOR_COF) / BIT_WEAR_CONSTANT
+        for wob, rpm, flowrate in zip(wobs, rpms, flowrates)
+    ]
+    cumulative = [sum(bit_grades[: i + 1]) for i in range(len(bit_grades))]
+    return [round(bg, 3) for bg in cumulative]
+
+
+def engine_path(wobs, rpms, flowrates):
+    return bg_engine.cumulative_bit_grade(
+        wobs, rpms, flowrates, MOTOR_COF, BIT_WEAR_CONSTANT
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--reference-rows", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    wobs = rng.uniform(0, 50_000, args.rows)
+    rpms = rng.uniform(0, 350, args.rows)
+    flowrates = rng.uniform(0, 500, args.rows)
+
+    start = time.perf_counter()
+    engine_path(wobs, rpms, flowrates)
+    engine_time = time.perf_counter() - start
+
+    n = args.reference_rows
+    start = time.perf_counter()
+    per_record_path(wobs[:n].tolist(), rpms[:n].tolist(), flowrates[:n].tolist())
+    reference_time = time.perf_counter() - start
+    # the cumulative sum of the per record path is quadratic in the number of rows
+    reference_time_extrapolated = reference_time * (args.rows / n) ** 2
+
+    print(f"engine:     {args.rows:>10} rows {engine_time:10.4f} s")
+    print(f"per record: {n:>10} rows {reference_time:10.4f} s")
+    print(
+        f"per record: {args.rows:>10} rows {reference_time_extrapolated:10.1f} s (extrapolated)"
+    )
+    print(f"speedup:    {reference_time_extrapolated / engine_time:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Track the cold start cost of the lambda entry point with python -X importtime.
+Every scenario runs in a fresh interpreter:
+
+- import: import lambda_function, what a cold start pays before the first event
+- get_app_setting: the import and one get_app_setting event, with the S3
+  resource replaced by a stand-in so only the imports of the task are measured
+
+The import time and the slowest packages are read from the -X importtime
+report, and the heavy client libraries that were loaded are listed.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 10 --write-baseline
+
+The medians are compared with benchmarks/baseline_import.json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).parent / ".."
+BASELINE_PATH = Path(__file__).parent / "baseline_import.json"
+HEAVY_MODULES = ("pymongo", "boto3", "botocore", "numpy", "pydantic")
+
+IMPORT = "import lambda_function"
+GET_APP_SETTING = """
+import io, json
+from src.connections import set_s3_resource
+
+class StandInObject:
+    def __init__(self, bucket_name, key):
+        pass
+
+    def get(self):
+        return {"Body": io.BytesIO(b'{"data": {}}'), "ETag": "etag"}
+
+class StandInS3:
+    Object = StandInObject
+
+set_s3_resource(StandInS3())
+import lambda_function
+lambda_function.lambda_handler(
+    {"body": json.dumps({"asset_id": 1, "task": "get_app_setting"})}
+)
+"""
+SCENARIOS = {"import": IMPORT, "get_app_setting": GET_APP_SETTING}
+# printed by the scenario after its code, the heavy modules it loaded
+REPORT = f"\nimport sys\nprint([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+
+
+def parse_importtime(stderr: str) -> Tuple[int, Dict[str, int]]:
+    """
+    The total microseconds of the imports in a -X importtime report and the
+    cumulative microseconds of every module (including the nested imports).
+    """
+    total = 0
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        cumulative[name.strip()] = int(cumulative_us)
+        # a top level import has a single space of indentation
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    return total, cumulative
+
+
+def run_scenario(code: str) -> Tuple[int, Dict[str, int], List[str]]:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code + REPORT],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = json.loads(completed.stdout.strip().splitlines()[-1].replace("'", '"'))
+    return (*parse_importtime(completed.stderr), loaded)
+
+
+def measure(code: str, repeat: int) -> Dict:
+    totals = []
+    modules: Dict[str, List[int]] = {}
+    loaded = []
+    for _ in range(repeat):
+        total, cumulative, loaded = run_scenario(code)
+        totals.append(total)
+        for name, us in cumulative.items():
+            modules.setdefault(name, []).append(us)
+    # the packages and src modules, the submodules are part of their package
+    tracked = {
+        name: statistics.median(us)
+        for name, us in modules.items()
+        if name.startswith("src.") or name == "lambda_function" or "." not in name
+    }
+    slowest = sorted(tracked.items(), key=lambda item: -item[1])[:12]
+    return {
+        "import_ms": statistics.median(totals) / 1000,
+        "slowest_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "heavy_modules": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--write-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for scenario, code in SCENARIOS.items():
+        result = measure(code, args.repeat)
+        results[scenario] = result
+        print(f"{scenario}: {result['import_ms']:.1f} ms of imports")
+        print(f"  heavy modules loaded: {', '.join(result['heavy_modules']) or '-'}")
+        for name, ms in result["slowest_ms"].items():
+            print(f"  {name:<32} {ms:8.1f} ms")
+        base = baseline.get(scenario)
+        if base and not args.write_baseline:
+            ratio = result["import_ms"] / base["import_ms"]
+            flag = "  SLOWER" if ratio > 1.25 else ""
+            print(f"  {ratio:.2f}x baseline ({base['import_ms']:.1f} ms){flag}")
+            for name in sorted(set(result["heavy_modules"]) - set(base["heavy_modules"])):
+                print(f"  {name} is now loaded")
+
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
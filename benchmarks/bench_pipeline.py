@@ -0,0 +1,245 @@
+"""
+Time the calculate_bg pipeline on synthetic wits data with local stand-ins:
+the wits, drillstring and motor data are read from a temporary resources
+folder (Api(local_only=True)), the bg upserts are built and handed to a
+collection that only counts them (or mongomock with --mongomock, which is
+quadratic in the number of upserts) and the state is a local file.
+
+The dataset is generated in one process and every size is timed in a fresh
+process, so the peak RSS is the one of the pipeline at that size.
+The stages are timed one after the other on the same data, then the whole
+BGApp.calculate_BG is timed end to end.
+
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000
+    python -m benchmarks.bench_pipeline --rows 1000 10000 --write-baseline
+
+The rows/sec of a run are compared with benchmarks/baseline_pipeline.json.
+"""
+import argparse
+import json
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict
+from unittest.mock import Mock
+
+import mongomock
+import numpy as np
+
+from src import bg_engine
+from src.connections import set_mongo_client, set_s3_resource
+from src.local_store import open_index
+from src.model import SETTINGS, DownholeMotor, DrillString, EmptyCacheInS3
+from src.motor_resolver import MotorCofResolver
+from src.osu_api import Api
+from src.p01_2_make_dummy_data import GenerateDummyData
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+from src.wits_decoder import decode_wits
+
+BASELINE_PATH = Path(__file__).parent / "baseline_pipeline.json"
+STAGES = ("fetch", "parse", "group", "join", "grade", "cumulate", "serialize", "post")
+ASSET_ID = 123456789
+START_TS = 1677112068
+BIT_WEAR_CONSTANT = 30_000_000_000_000
+
+
+class CountingCollection:
+    """Takes the bulk writes of Api.post_data without storing them."""
+
+    def __init__(self) -> None:
+        self.upserts = 0
+
+    def create_index(self, *args, **kwargs) -> None:
+        pass
+
+    def bulk_write(self, operations, ordered=True) -> Mock:
+        self.upserts += len(operations)
+        return Mock(bulk_api_result={"nUpserted": len(operations), "nMatched": 0})
+
+
+class CountingClient(dict):
+    def __missing__(self, name):
+        # client[database][collection]
+        self[name] = CountingClient() if not self else CountingCollection()
+        return self[name]
+
+
+def make_mongo_client(use_mongomock: bool):
+    if use_mongomock:
+        return mongomock.MongoClient()
+    client = CountingClient()
+    client[SETTINGS.MONGO_DATABASE]["BG"] = CountingCollection()
+    return client
+
+
+class StandInBGApp(BGApp):
+    """BGApp with the app setting and the legacy S3 cache replaced by constants."""
+
+    def load_settings(self) -> Dict:
+        return {"asset_id": ASSET_ID, "data": {"bit_wear_constant": BIT_WEAR_CONSTANT}}
+
+    def get_cache(self):
+        raise EmptyCacheInS3()
+
+
+def make_dataset(path: Path, rows: int, drillstrings: int) -> None:
+    """wits.json with rows records over the drillstrings, one after the other."""
+    np.random.seed(17)
+    random.seed(17)
+    per_ds = rows // drillstrings
+    records = []
+    for i in range(drillstrings):
+        records.extend(
+            GenerateDummyData._generate_records(
+                number_of_datapoints=per_ds,
+                start_ts=START_TS + i * per_ds,
+                drill_string_id=f"ds_{i + 1}",
+            )
+        )
+    with open(path / "wits.json", "w") as f:
+        json.dump(records, f)
+    with open(path / "ds_data.json", "w") as f:
+        json.dump(
+            [
+                {"_drill_string_id": f"ds_{i + 1}", "down_hole_motor_id": f"motor_id_{i + 1}"}
+                for i in range(drillstrings)
+            ],
+            f,
+        )
+    with open(path / "dhm_data.json", "w") as f:
+        json.dump(
+            [
+                {"motor_id": f"motor_id_{i + 1}", "motor_cof": 400.0 + i}
+                for i in range(drillstrings)
+            ],
+            f,
+        )
+    # build the local index here, outside of the timings and of the measured process
+    open_index(path / "wits.json")
+
+
+def timed(timings: Dict[str, float], stage: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] = time.perf_counter() - start
+    return result
+
+
+def run_size(path: Path, rows: int, use_mongomock: bool = False) -> Dict:
+    """Time the stages and calculate_bg on the dataset in path."""
+    end_ts = START_TS + rows + 1
+    set_mongo_client(make_mongo_client(use_mongomock))
+    set_s3_resource(Mock())
+    api = Api(resources_path=path, local_only=True)
+    event = {"start_ts": START_TS, "end_ts": end_ts, "asset_id": ASSET_ID}
+    bg_app = StandInBGApp(api, event, state_store=LocalFileStateStore(path / "state"))
+
+    timings = {}
+    records = timed(timings, "fetch", lambda: list(bg_app.fetch_wits_records()))
+    wits_rows = timed(timings, "parse", lambda: list(decode_wits(records)))
+    grouped = timed(timings, "group", bg_engine.group_by_drillstring, wits_rows)
+    ds_records = [DrillString(**r) for r in json.load(open(path / "ds_data.json"))]
+    dhm_records = [DownholeMotor(**r) for r in json.load(open(path / "dhm_data.json"))]
+    cofs = timed(timings, "join", MotorCofResolver.join, ds_records, dhm_records)
+
+    def grade():
+        return {
+            ds: bg_engine.bit_grade_model(
+                columns.wob, columns.rpm, columns.flowrate, cofs[ds], BIT_WEAR_CONSTANT
+            )
+            for ds, columns in grouped.items()
+        }
+
+    def cumulate():
+        return {ds: np.round(np.cumsum(bgs), 3) for ds, bgs in bit_grades.items()}
+
+    def serialize():
+        return {
+            ds: bg_engine.to_bit_grade_records(grouped[ds].timestamp, ds, bgs)
+            for ds, bgs in cumulative.items()
+        }
+
+    def post():
+        for bit_grade_list in bit_grade_lists.values():
+            api.post_data(data=bit_grade_list, asset_id=ASSET_ID)
+
+    bit_grades = timed(timings, "grade", grade)
+    cumulative = timed(timings, "cumulate", cumulate)
+    bit_grade_lists = timed(timings, "serialize", serialize)
+    timed(timings, "post", post)
+
+    # the whole task, on a fresh state and BG collection
+    set_mongo_client(make_mongo_client(use_mongomock))
+    bg_app = StandInBGApp(api, event, state_store=LocalFileStateStore(path / "state2"))
+    graded = timed(timings, "calculate_bg", bg_app.calculate_BG, _return=True)
+
+    return {
+        "rows": rows,
+        "graded_rows": len(graded),
+        "seconds": timings,
+        "rows_per_sec": {stage: rows / max(t, 1e-9) for stage, t in timings.items()},
+        # kilobytes on linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def in_new_process(func, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(func, *args).result()
+
+
+def compare(result: Dict, baseline: Dict) -> str:
+    base = baseline.get(str(result["rows"]))
+    if not base:
+        return "  (no baseline)"
+    lines = []
+    for stage, rate in result["rows_per_sec"].items():
+        if stage in base["rows_per_sec"]:
+            ratio = rate / base["rows_per_sec"][stage]
+            flag = "  SLOWER" if ratio < 0.8 else ""
+            lines.append(f"  {stage:<12} {ratio:6.2f}x baseline{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--drillstrings", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--mongomock", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tempdir:
+            in_new_process(make_dataset, Path(tempdir), rows, args.drillstrings)
+            result = in_new_process(run_size, Path(tempdir), rows, args.mongomock)
+        results[str(rows)] = result
+        print(f"{rows} rows ({result['graded_rows']} graded), peak rss {result['peak_rss_mb']:.0f} MB")
+        for stage in STAGES + ("calculate_bg",):
+            print(
+                f"  {stage:<12} {result['seconds'][stage]:10.4f} s "
+                f"{result['rows_per_sec'][stage]:14.0f} rows/s"
+            )
+        if not args.write_baseline:
+            print(compare(result, baseline))
+
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compare the lean wits decoder with the pydantic parsing path of BGApp.
+
+    python -m benchmarks.bench_wits_decoder --repeat 100
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from src import bg_engine
+from src.model import Wits
+from src.wits_decoder import decode_wits
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+
+
+def pydantic_path(records):
+    parsed_wits_records = [
+        Wits.parse_wits(record)
+        for record in records
+        if Wits.check_fields(record) and Wits.check_activity(record)
+    ]
+    return bg_engine.group_by_drillstring(parsed_wits_records)
+
+
+def decoder_path(records):
+    return bg_engine.group_by_drillstring(decode_wits(records))
+
+
+def timeit(func, records):
+    start = time.perf_counter()
+    func(records)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100, help="copies of wits.json")
+    args = parser.parse_args()
+
+    with open(RESOURCES_PATH / "wits.json") as f:
+        records = json.load(f) * args.repeat
+
+    pydantic_time = timeit(pydantic_path, records)
+    decoder_time = timeit(decoder_path, records)
+    print(f"records:  {len(records)}")
+    print(f"pydantic: {pydantic_time:8.3f} s {len(records) / pydantic_time:12.0f} rows/s")
+    print(f"decoder:  {decoder_time:8.3f} s {len(records) / decoder_time:12.0f} rows/s")
+    print(f"speedup:  {pydantic_time / decoder_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Load test of POST /task on the FastAPI (app/main.py) and Flask (app_flask.py)
+servers. Each server is started in its own process on a free local port,
+wired to stand-ins: mongoDB is mongomock loaded with the wits, drillstring
+and motor resources, S3 (the app setting, the cache and the bg states) is
+moto. The requests are sent by --concurrency client threads with the task
+mix of --mix, after one warm up request per task that is not counted.
+
+The worker count is the number of threads running the tasks: the task runner
+threads of the FastAPI server (SETTINGS.SERVER_WORKERS, the calculate_bg runs
+are still capped by SETTINGS.SERVER_TASK_CONCURRENCY) and the request threads
+of the Flask server. The stand-ins run in the server process, so the results
+compare the servers rather than predict the production latency, and the bg
+upserts of overlapping calculate_bg windows run at the same time can fail
+(they are counted as errors).
+
+    python -m benchmarks.load_test --flavors fastapi flask --workers 1 8 --concurrency 16
+    python -m benchmarks.load_test --mix calculate_bg=1 return_cache=4 --requests 2000
+
+The p50/p95/p99 latency, the error rate and the requests/sec are reported per
+server flavor and worker count, and per task. A stand-in server can be run on
+its own with --serve fastapi --port 8080 (test/test_server.py uses it too).
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import mongomock
+import numpy as np
+import requests
+from werkzeug.serving import BaseWSGIServer
+
+from src.connections import get_collection, set_mongo_client
+from src.model import SETTINGS
+
+ROOT_PATH = Path(__file__).parent / ".."
+RESOURCES_PATH = ROOT_PATH / "resources"
+FLAVORS = ("fastapi", "flask")
+TASKS = ("calculate_bg", "return_cache", "get_app_setting")
+PERCENTILES = (50, 95, 99)
+ASSET_ID = 123456789
+# time range of resources/wits.json
+START_TS = 1677112069
+END_TS = 1677115068
+BIT_WEAR_CONSTANT = 30_000_000_000_000
+SERVER_START_TIMEOUT = 60
+
+
+# stand-in server, run in its own process
+
+
+def load_mongo(resources_path: Path) -> mongomock.MongoClient:
+    """mongomock with the wits, drillstring and motor records of the resources."""
+    client = mongomock.MongoClient()
+    set_mongo_client(client)
+    for collection_name, file_name in [
+        (SETTINGS.WITS_COLLECTION, "wits.json"),
+        (SETTINGS.DRILL_STRING_COLLECTION, "ds_data.json"),
+        (SETTINGS.DOWN_HOLE_MOTOR_COLLECTION, "dhm_data.json"),
+    ]:
+        with open(resources_path / file_name) as f:
+            get_collection(collection_name).insert_many(json.load(f))
+    return client
+
+
+def start_moto(resources_path: Path):
+    """Mock S3 in this process, with the app setting and the cache of the resources."""
+    from moto import mock_aws
+
+    os.environ.setdefault("S3_AWS_ACCESS_KEY", "testing")
+    os.environ.setdefault("S3_AWS_SECRET_ACCESS_KEY", "testing")
+    mock = mock_aws()
+    mock.start()
+
+    import boto3
+
+    s3 = boto3.client("s3", region_name=SETTINGS.REGION_NAME)
+    bucket = {"Bucket": SETTINGS.CACHE_BUCKET_NAME}
+    if SETTINGS.REGION_NAME != "us-east-1":
+        bucket["CreateBucketConfiguration"] = {"LocationConstraint": SETTINGS.REGION_NAME}
+    s3.create_bucket(**bucket)
+    s3.put_object(
+        Bucket=SETTINGS.CACHE_BUCKET_NAME,
+        Key=SETTINGS.RETURN_APP_SETTING,
+        Body=json.dumps({"asset_id": ASSET_ID, "data": {"bit_wear_constant": BIT_WEAR_CONSTANT}}),
+    )
+    with open(resources_path / "calculated_bg" / "cache.json", "rb") as f:
+        s3.put_object(Bucket=SETTINGS.CACHE_BUCKET_NAME, Key=SETTINGS.CACHE_FILE_NAME, Body=f.read())
+    return mock
+
+
+def serve(flavor: str, port: int, workers: int, resources_path: Path = RESOURCES_PATH) -> None:
+    """Run a stand-in server of the flavor until it is stopped."""
+    if flavor == "fastapi":
+        from app.main import app
+    elif flavor == "flask":
+        from app_flask import app
+    else:
+        raise ValueError(f"Unknown server flavor {flavor}")
+    # after the imports, the modules of src set the level of the root logger
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    start_moto(resources_path)
+    load_mongo(resources_path)
+
+    if flavor == "fastapi":
+        import uvicorn
+
+        SETTINGS.SERVER_WORKERS = workers
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    else:
+        PooledWSGIServer("127.0.0.1", port, app, workers).serve_forever()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """The werkzeug server with the requests handled by a fixed number of threads."""
+
+    def __init__(self, host: str, port: int, app, workers: int) -> None:
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flask")
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def start_server(
+    flavor: str, workers: int, resources_path: Path = RESOURCES_PATH
+) -> Iterator[str]:
+    """Start a stand-in server in a new process and yield its url once it is up."""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.load_test",
+            "--serve",
+            flavor,
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--resources",
+            str(resources_path),
+        ],
+        cwd=ROOT_PATH,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"The {flavor} server exited with {process.returncode}")
+            try:
+                if requests.get(url, timeout=1).ok:
+                    break
+            except requests.ConnectionError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"The {flavor} server did not start on {url}")
+            time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+# load generator
+
+
+def parse_mix(items: Iterable[str]) -> Dict[str, float]:
+    """calculate_bg=1 return_cache=2 -> {"calculate_bg": 1.0, "return_cache": 2.0}"""
+    mix = {}
+    for item in items:
+        task, _, weight = item.partition("=")
+        if task not in TASKS:
+            raise ValueError(f"Unknown task {task}, the tasks are {TASKS}")
+        mix[task] = float(weight or 1)
+    return mix
+
+
+def make_events(
+    mix: Dict[str, float], count: int, window: int = 60, seed: int = 0
+) -> List[Dict]:
+    """count events of the tasks of the mix, the calculate_bg windows are random."""
+    rng = random.Random(seed)
+    tasks = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    events = []
+    for task in tasks:
+        start_ts = rng.randrange(START_TS, END_TS - window)
+        events.append(
+            {"start_ts": start_ts, "end_ts": start_ts + window, "asset_id": ASSET_ID, "task": task}
+        )
+    return events
+
+
+class LoadClient:
+    """POST events to url/task from a pool of threads, one session per thread."""
+
+    def __init__(self, url: str, concurrency: int, timeout: float = 60) -> None:
+        self._url = f"{url}/task"
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def post(self, event: Dict) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = self._session().post(self._url, json=event, timeout=self._timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return {
+            "task": event["task"],
+            "status": status,
+            "error": status != 200,
+            "latency": time.perf_counter() - start,
+        }
+
+    def run(self, events: List[Dict]) -> Dict[str, Any]:
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            start = time.perf_counter()
+            runs = list(executor.map(self.post, events))
+            seconds = time.perf_counter() - start
+        return summarize(runs, seconds)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    points = np.percentile(values, PERCENTILES)
+    return {
+        **{f"p{p}": float(v) for p, v in zip(PERCENTILES, points)},
+        "max": float(max(values)),
+    }
+
+
+def _stats(runs: List[Dict], seconds: float) -> Dict[str, Any]:
+    errors = sum(run["error"] for run in runs)
+    return {
+        "requests": len(runs),
+        "errors": errors,
+        "error_rate": errors / len(runs) if runs else 0.0,
+        "throughput": len(runs) / seconds if seconds else 0.0,
+        "latency": _percentiles([run["latency"] for run in runs]),
+    }
+
+
+def summarize(runs: List[Dict], seconds: float) -> Dict[str, Any]:
+    summary = {"seconds": seconds, **_stats(runs, seconds), "tasks": {}}
+    for task in sorted({run["task"] for run in runs}):
+        summary["tasks"][task] = _stats([run for run in runs if run["task"] == task], seconds)
+    return summary
+
+
+def load_test(
+    flavor: str,
+    workers: int,
+    events: List[Dict],
+    concurrency: int,
+    resources_path: Path = RESOURCES_PATH,
+) -> Dict[str, Any]:
+    """Start a stand-in server, warm it up with one event per task and send it the events."""
+    with start_server(flavor, workers, resources_path) as url:
+        client = LoadClient(url, concurrency)
+        warm_up = {event["task"]: event for event in events}
+        for event in warm_up.values():
+            client.post(event)
+        summary = client.run(events)
+    return {"flavor": flavor, "workers": workers, "concurrency": concurrency, **summary}
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['flavor']}, {result['workers']} workers, {result['concurrency']} clients: "
+        f"{result['requests']} requests in {result['seconds']:.2f} s, "
+        f"{result['throughput']:.1f} requests/s, error rate {result['error_rate']:.1%}"
+    )
+    for name, stats in [("all", result), *result["tasks"].items()]:
+        latency = "  ".join(f"{k} {v * 1000:8.1f} ms" for k, v in stats["latency"].items())
+        print(f"  {name:<16} {stats['requests']:6d} req {stats['error_rate']:7.1%}  {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flavors", nargs="+", choices=FLAVORS, default=list(FLAVORS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=["calculate_bg=1", "return_cache=2", "get_app_setting=2"],
+        help="task=weight",
+    )
+    parser.add_argument("--window", type=int, default=60, help="seconds of the calculate_bg events")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resources", type=Path, default=RESOURCES_PATH)
+    parser.add_argument("--output", type=Path, help="write the results as json")
+    parser.add_argument("--serve", choices=FLAVORS, help="only run a stand-in server")
+    parser.add_argument("--port", type=int, default=8080, help="port of --serve")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workers[0], args.resources)
+        return
+
+    events = make_events(parse_mix(args.mix), args.requests, args.window, args.seed)
+    results = []
+    for flavor in args.flavors:
+        for workers in args.workers:
+            result = load_test(flavor, workers, events, args.concurrency, args.resources)
+            print_result(result)
+            results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
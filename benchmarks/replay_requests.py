@@ -0,0 +1,208 @@
+"""
+Replay a request log (see src/request_log.py, written by the FastAPI, Flask
+and lambda entry points when BG_REQUEST_LOG is set) through BGApp.run with
+local stand-ins: the wits, drillstring and motor data are read from a
+resources folder (Api(local_only=True)), the bg upserts go to a counting
+collection (benchmarks/bench_pipeline.py), S3 is kept in memory and the state
+is a local file.
+
+The events are sent at the pace of the log (--speed 1), faster (--speed 10)
+or all at once (--speed 0), by --workers threads. The latency (from the time
+the event was due to the end of its run), the throughput and the captured
+timings are reported per task.
+
+    BG_REQUEST_LOG=/tmp/bg_requests.jsonl uvicorn app.main:app ...
+    python -m benchmarks.replay_requests /tmp/bg_requests.jsonl --speed 10
+"""
+import argparse
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import botocore.exceptions
+import numpy as np
+
+from benchmarks.bench_pipeline import BIT_WEAR_CONSTANT, make_mongo_client
+from src.connections import set_mongo_client, set_s3_resource
+from src.model import SETTINGS
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.request_log import read_request_log
+from src.state_store import BGStateStore, LocalFileStateStore
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+PERCENTILES = (50, 90, 99)
+
+
+class MemoryObject:
+    def __init__(self, s3: "MemoryS3", key) -> None:
+        self._s3 = s3
+        self._key = key
+
+    def get(self, IfNoneMatch: Optional[str] = None) -> Dict[str, Any]:
+        with self._s3.lock:
+            body = self._s3.objects.get(self._key)
+        if body is None:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+            )
+        etag = f'"{hash(body)}"'
+        if IfNoneMatch == etag:
+            raise botocore.exceptions.ClientError({"Error": {"Code": "304"}}, "GetObject")
+        return {"Body": io.BytesIO(body), "ETag": etag, "ContentLength": len(body)}
+
+    def put(self, Body) -> Dict[str, Any]:
+        with self._s3.lock:
+            self._s3.objects[self._key] = Body.encode() if isinstance(Body, str) else Body
+        return {}
+
+    def delete(self) -> Dict[str, Any]:
+        with self._s3.lock:
+            self._s3.objects.pop(self._key, None)
+        return {}
+
+
+class MemoryS3:
+    """The part of the boto3 S3 resource used by BGApp (Object get/put/delete)."""
+
+    def __init__(self) -> None:
+        self.objects: Dict[Any, bytes] = {}
+        self.lock = threading.Lock()
+
+    def Object(self, bucket_name: str, key: str) -> MemoryObject:
+        return MemoryObject(self, (bucket_name, key))
+
+
+def run_entry(entry: Dict, due: float, api: Api, state_store: BGStateStore) -> Dict:
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        BGApp(api, dict(entry["event"]), state_store=state_store).run()
+    except Exception:
+        status = "failed"
+    end = time.perf_counter()
+    return {
+        "task": entry["event"].get("task"),
+        "status": status,
+        "latency": end - due,
+        "service": end - start,
+        "captured": entry.get("seconds"),
+    }
+
+
+def replay(
+    entries: List[Dict],
+    api: Api,
+    state_store: BGStateStore,
+    speed: float = 1.0,
+    workers: int = 8,
+) -> Dict[str, Any]:
+    """
+    Send the events of the entries at their logged times divided by speed
+    (speed 0 sends them all at once) and return the summary of the runs.
+    """
+    if not entries:
+        return summarize([], 0.0)
+    first_ts = entries[0]["ts"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for entry in entries:
+            due = time.perf_counter()
+            if speed:
+                due = start + (entry["ts"] - first_ts) / speed
+                time.sleep(max(0.0, due - time.perf_counter()))
+            futures.append(executor.submit(run_entry, entry, due, api, state_store))
+        runs = [future.result() for future in futures]
+    return summarize(runs, time.perf_counter() - start)
+
+
+def _percentiles(values: Iterable[float]) -> Dict[str, float]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    points = np.percentile(values, PERCENTILES)
+    return {
+        **{f"p{p}": float(v) for p, v in zip(PERCENTILES, points)},
+        "max": float(max(values)),
+    }
+
+
+def summarize(runs: List[Dict], seconds: float) -> Dict[str, Any]:
+    summary = {"requests": len(runs), "seconds": seconds, "tasks": {}}
+    summary["throughput"] = len(runs) / seconds if seconds else 0.0
+    for task in sorted({run["task"] for run in runs}, key=str):
+        task_runs = [run for run in runs if run["task"] == task]
+        summary["tasks"][str(task)] = {
+            "requests": len(task_runs),
+            "failed": sum(run["status"] == "failed" for run in task_runs),
+            "throughput": len(task_runs) / seconds if seconds else 0.0,
+            "latency": _percentiles(run["latency"] for run in task_runs),
+            "service": _percentiles(run["service"] for run in task_runs),
+            "captured": _percentiles(run["captured"] for run in task_runs),
+        }
+    return summary
+
+
+def stand_ins(resources_path: Path, state_path: Path) -> Dict[str, Any]:
+    """Point BGApp to the local stand-ins and return the api and state store to replay with."""
+    set_mongo_client(make_mongo_client(use_mongomock=False))
+    s3 = MemoryS3()
+    s3.Object(SETTINGS.CACHE_BUCKET_NAME, SETTINGS.RETURN_APP_SETTING).put(
+        Body=json.dumps({"data": {"bit_wear_constant": BIT_WEAR_CONSTANT}})
+    )
+    set_s3_resource(s3)
+    return {
+        "api": Api(resources_path=resources_path, local_only=True),
+        "state_store": LocalFileStateStore(state_path),
+    }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"{summary['requests']} requests in {summary['seconds']:.2f} s, "
+        f"{summary['throughput']:.1f} requests/s"
+    )
+    for task, stats in summary["tasks"].items():
+        print(f"{task}: {stats['requests']} requests, {stats['failed']} failed")
+        for name in ("latency", "service", "captured"):
+            if stats[name]:
+                values = "  ".join(f"{k} {v * 1000:9.1f} ms" for k, v in stats[name].items())
+                print(f"  {name:<9} {values}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", type=Path, help="request log (its rotated files are read too)")
+    parser.add_argument("--speed", type=float, default=1.0, help="0 sends all the events at once")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--resources", type=Path, default=RESOURCES_PATH)
+    parser.add_argument("--tasks", nargs="+", help="replay only these tasks")
+    parser.add_argument("--output", type=Path, help="write the summary as json")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    entries = read_request_log(args.log)
+    if args.tasks:
+        entries = [e for e in entries if e["event"].get("task") in args.tasks]
+    with tempfile.TemporaryDirectory() as tempdir:
+        summary = replay(
+            entries,
+            speed=args.speed,
+            workers=args.workers,
+            **stand_ins(args.resources, Path(tempdir)),
+        )
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,33 @@
 import json
 import logging
-from typing import Dict
+from typing import Dict, Optional
 
 from src.osu_api import Api
 from src.p03_1_app import BGApp
+from src.request_log import logged_request
 
 # Initialize the logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# warm state, kept between the invocations of a lambda container. The mongoDB
+# client, the S3 resources (connections.py), the app settings and the motor cofs
+# (APP_SETTINGS_CACHE, MOTOR_COF_RESOLVER) are module level as well.
+_api: Optional[Api] = None
+
+
+def get_api() -> Api:
+    global _api
+    if _api is None:
+        _api = Api()
+    return _api
+
 
 def lambda_handler(event: Dict, context=None):
     event = json.loads(event["body"])
     logger.info(f"Lambda function executed successfully with event {event}")
-    api = Api()
-    obj = BGApp(api, event)
-    returned_value = obj.run()
+    with logged_request("lambda", event) as request:
+        obj = BGApp(get_api(), event)
+        returned_value = request.result = obj.run()
     logger.info(f"returned_value {returned_value}")
     return returned_value
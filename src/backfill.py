@@ -0,0 +1,213 @@
+import argparse
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / ".."))  # noqa: E402
+
+from src import bg_engine
+from src.model import SETTINGS, BGState
+from src.motor_resolver import MOTOR_COF_RESOLVER
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import BGStateStore, get_state_store
+from src.wits_decoder import decode_wits
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# timestamps and bit grades (cumulative inside the partition) of each drillstring
+PartitionResult = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+def plan_partitions(start_ts: int, end_ts: int, partition_seconds: int) -> List[Tuple[int, int]]:
+    """Split [start_ts, end_ts) into consecutive windows of partition_seconds."""
+    return [
+        (ts, min(ts + partition_seconds, end_ts))
+        for ts in range(start_ts, end_ts, partition_seconds)
+    ]
+
+
+def grade_partition(
+    asset_id: Hashable,
+    ts_min: int,
+    ts_max: int,
+    ds_dhm_cof_map: Dict[str, float],
+    bit_wear_constant: float,
+    api_kwargs: Dict[str, Any],
+    read_from_mongo: bool = True,
+) -> PartitionResult:
+    """
+    Read the wits records of one window and grade each drillstring of it
+    starting from zero. Runs in a worker process started with spawn (a forked
+    process would share the mongoDB client of the parent), so it only takes
+    and returns picklable values and opens its own clients.
+    """
+    api = Api(**api_kwargs)
+    query = {
+        "sort": 1,
+        "fields": ["timestamp", "provider", "drill_string_id", "data", "activity"],
+        "ts_min": ts_min,
+        "ts_max": ts_max,
+    }
+    if read_from_mongo:
+        query["read_from_mongo"] = "True"
+    records = (
+        record
+        for page in api.iter_pages(
+            provider_name=SETTINGS.PROVIDER,
+            data_name=SETTINGS.WITS_COLLECTION,
+            query=query,
+            asset_id=asset_id,
+        )
+        for record in page
+    )
+
+    result = {}
+    for ds, columns in bg_engine.group_by_drillstring(decode_wits(records)).items():
+        bit_grades = bg_engine.bit_grade_model(
+            columns.wob, columns.rpm, columns.flowrate, ds_dhm_cof_map[ds], bit_wear_constant
+        )
+        result[ds] = (columns.timestamp, np.cumsum(bit_grades))
+    return result
+
+
+def stitch_partition(
+    partition: PartitionResult, totals: Dict[str, float], decimals: int = 3
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Offset the cumulative bg of each drillstring of a partition by the total of
+    the earlier partitions of the same drillstring, then round it. totals holds
+    these totals and is moved past the partition.
+    """
+    stitched = {}
+    for ds, (timestamps, bit_grades) in partition.items():
+        offset = totals.get(ds, 0.0)
+        totals[ds] = offset + bit_grades[-1]
+        stitched[ds] = (timestamps, np.round(bit_grades + offset, decimals))
+    return stitched
+
+
+def graded_partitions(
+    executor: Executor,
+    windows: List[Tuple[int, int]],
+    in_flight: int,
+    asset_id: Hashable,
+    *args,
+) -> Iterator[PartitionResult]:
+    """
+    Grade the windows on the executor and yield their results in time order,
+    with at most in_flight windows submitted ahead of the one yielded.
+    """
+    pending = deque()
+    for ts_min, ts_max in windows:
+        pending.append(executor.submit(grade_partition, asset_id, ts_min, ts_max, *args))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def backfill(
+    asset_id: Hashable,
+    start_ts: int,
+    end_ts: int,
+    api: Optional[Api] = None,
+    bit_wear_constant: Optional[float] = None,
+    partition_seconds: int = SETTINGS.BACKFILL_PARTITION_SECONDS,
+    max_workers: Optional[int] = None,
+    read_from_mongo: bool = True,
+    api_kwargs: Optional[Dict[str, Any]] = None,
+    state_store: Optional[BGStateStore] = None,
+    post: bool = True,
+) -> Dict[str, Any]:
+    """
+    Recompute the bit grade of an asset over [start_ts, end_ts).
+    The window is split into partitions of partition_seconds which are read
+    and graded on a process pool, then offset by the earlier partitions of each
+    drillstring and posted one partition at a time. The bg starts
+    from zero at start_ts, so start_ts should be the start of the history of
+    the drillstrings. The records are upserted in the BG collection and the
+    state of each drillstring is moved to its last record unless the state is
+    already newer (a realtime run went past end_ts).
+    bit_wear_constant defaults to the one in the app setting of the asset.
+    """
+    api_kwargs = api_kwargs or {}
+    api = api or Api(**api_kwargs)
+    state_store = state_store or get_state_store()
+    event = {"start_ts": start_ts, "end_ts": end_ts, "asset_id": asset_id}
+    bg_app = BGApp(api, event, state_store=state_store)
+    if bit_wear_constant is None:
+        bit_wear_constant = bg_app.load_settings().get("data").get("bit_wear_constant")
+    # all the drillstrings of the asset
+    ds_dhm_cof_map = MOTOR_COF_RESOLVER.get(
+        asset_id, bg_app.get_ds_data, bg_app.get_downhole_motor_data
+    )
+
+    windows = plan_partitions(start_ts, end_ts, partition_seconds)
+    logger.info(f"Backfilling {asset_id} in {len(windows)} partitions")
+    summary = {"asset_id": asset_id, "partitions": len(windows), "bg_records": {}}
+    # the partitions are posted in time order as soon as the totals of the
+    # earlier ones are known, the bounded look ahead keeps the memory flat
+    in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    totals: Dict[str, float] = {}
+    latest: Dict[str, Dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as executor:
+        for partition in graded_partitions(
+            executor,
+            windows,
+            in_flight,
+            asset_id,
+            ds_dhm_cof_map,
+            bit_wear_constant,
+            api_kwargs,
+            read_from_mongo,
+        ):
+            for ds, (timestamps, bit_grades) in stitch_partition(partition, totals).items():
+                bit_grade_list = bg_engine.to_bit_grade_records(timestamps, ds, bit_grades)
+                summary["bg_records"][ds] = summary["bg_records"].get(ds, 0) + len(bit_grade_list)
+                if post:
+                    bg_app.post_bg(bit_grade_list)
+                    latest[ds] = bit_grade_list[-1]
+
+    if latest:
+        state_store.put(
+            asset_id,
+            [
+                BGState(drillstring_id=ds, timestamp=record["timestamp"], bg=record["data"]["bg"])
+                for ds, record in latest.items()
+            ],
+        )
+    logger.info(f"Backfill done {summary}")
+    return summary
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Recompute the bit grade of an asset.")
+    parser.add_argument("--asset-id", type=int, required=True)
+    parser.add_argument("--start-ts", type=int, required=True)
+    parser.add_argument("--end-ts", type=int, required=True)
+    parser.add_argument("--bit-wear-constant", type=float, default=None)
+    parser.add_argument(
+        "--partition-seconds", type=int, default=SETTINGS.BACKFILL_PARTITION_SECONDS
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    print(
+        backfill(
+            args.asset_id,
+            args.start_ts,
+            args.end_ts,
+            bit_wear_constant=args.bit_wear_constant,
+            partition_seconds=args.partition_seconds,
+            max_workers=args.workers,
+        )
+    )
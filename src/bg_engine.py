@@ -0,0 +1,134 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from src.model import SETTINGS
+
+
+class DrillStringColumns:
+    """
+    Column buffers of the wits records of one drillstring in timestamp order.
+    Records are appended to compact typed buffers; if a record is older than
+    the previous one, the columns are stable sorted once in finalize.
+    """
+
+    __slots__ = (
+        "drill_string_id",
+        "timestamp",
+        "wob",
+        "rpm",
+        "flowrate",
+        "_in_order",
+        "_last_ts",
+    )
+
+    def __init__(self, drill_string_id: str) -> None:
+        self.drill_string_id = drill_string_id
+        self.timestamp = array("q")
+        self.wob = array("d")
+        self.rpm = array("d")
+        self.flowrate = array("d")
+        self._in_order = True
+        self._last_ts = None
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def append(self, timestamp: int, wob: float, rpm: float, flowrate: float) -> None:
+        if self._last_ts is not None and timestamp < self._last_ts:
+            self._in_order = False
+        self._last_ts = timestamp
+        self.timestamp.append(timestamp)
+        self.wob.append(wob)
+        self.rpm.append(rpm)
+        self.flowrate.append(flowrate)
+
+    def finalize(self) -> "DrillStringColumns":
+        """Turn the buffers into numpy arrays sorted by timestamp."""
+        self.timestamp = np.frombuffer(self.timestamp, dtype=np.int64)
+        self.wob = np.frombuffer(self.wob, dtype=np.float64)
+        self.rpm = np.frombuffer(self.rpm, dtype=np.float64)
+        self.flowrate = np.frombuffer(self.flowrate, dtype=np.float64)
+        if not self._in_order:
+            order = np.argsort(self.timestamp, kind="stable")
+            self.timestamp = self.timestamp[order]
+            self.wob = self.wob[order]
+            self.rpm = self.rpm[order]
+            self.flowrate = self.flowrate[order]
+            self._in_order = True
+        return self
+
+
+def group_by_drillstring(records: Iterable[Any]) -> Dict[str, DrillStringColumns]:
+    """
+    Partition parsed wits records (objects with timestamp, drill_string_id, wob,
+    rpm and flowrate) in one pass into per drillstring columns. The drillstrings
+    keep the order of their first record, the rows of each are in timestamp order.
+    """
+    columns_per_ds: Dict[str, DrillStringColumns] = {}
+    for record in records:
+        columns = columns_per_ds.get(record.drill_string_id)
+        if columns is None:
+            columns = columns_per_ds[record.drill_string_id] = DrillStringColumns(
+                record.drill_string_id
+            )
+        columns.append(record.timestamp, record.wob, record.rpm, record.flowrate)
+    for columns in columns_per_ds.values():
+        columns.finalize()
+    return columns_per_ds
+
+
+def bit_grade_model(
+    wob: np.ndarray,
+    rpm: np.ndarray,
+    flowrate: np.ndarray,
+    motor_cof: float,
+    bit_wear_constant: float,
+) -> np.ndarray:
+    """
+    Bit grade of every wits record of a drillstring.
+    Bit grade = wob * (rpm + flowrate * motor_cof) / BIT_WEAR_CONSTANT
+    """
+    return wob * (rpm + flowrate * motor_cof) / bit_wear_constant
+
+
+def cumulative_bit_grade(
+    wob: np.ndarray,
+    rpm: np.ndarray,
+    flowrate: np.ndarray,
+    motor_cof: float,
+    bit_wear_constant: float,
+    offset: float = 0.0,
+    decimals: int = 3,
+) -> np.ndarray:
+    """
+    Cumulative bit grade of a drillstring. The offset is the latest bit grade
+    of the same drillstring (from the cache) and is added to the running total.
+    """
+    bit_grades = bit_grade_model(wob, rpm, flowrate, motor_cof, bit_wear_constant)
+    cumulative_bit_grades = np.cumsum(bit_grades)
+    if offset:
+        cumulative_bit_grades += offset
+    return np.round(cumulative_bit_grades, decimals)
+
+
+def to_bit_grade_records(
+    timestamps: Sequence[int], drillstring_id: str, bit_grades: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Make the BitGrade dicts (same as BitGrade(...).dict()) from the graded columns.
+    The dicts are built directly to avoid a pydantic model per record.
+    """
+    provider = SETTINGS.PROVIDER
+    return [
+        {
+            "timestamp": timestamp,
+            "provider": provider,
+            "drillstring_id": drillstring_id,
+            "data": {"bg": bg},
+        }
+        for timestamp, bg in zip(
+            np.asarray(timestamps).tolist(), np.asarray(bit_grades).tolist()
+        )
+    ]
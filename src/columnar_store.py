@@ -0,0 +1,196 @@
+"""
+Parquet copies of the local resource collections (wits, ds_data, dhm_data, BG).
+The records are stored sorted on the timestamp in row groups of
+SETTINGS.PARQUET_ROW_GROUP_SIZE records, each with the min/max statistics of
+its columns, so a time window (or drillstring) read only decodes the row
+groups that can hold its records. The size and mtime of the json file a
+copy was made from are kept in its metadata; a copy whose json file changed
+since is not used. pyarrow is optional: without it the json files are used.
+
+    python -m src.columnar_store resources resources/calculated_bg
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from src.local_store import source_meta
+from src.model import SETTINGS
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+PARQUET_SUFFIX = ".parquet"
+# key of the size and mtime of the source json file in the parquet metadata
+SOURCE_META_KEY = b"source"
+
+# pyarrow is imported on first use (it is optional and slow to import)
+_pyarrow = None
+
+# parquet copy -> (its meta, meta of the json file, whether it is current)
+_checked: Dict[Path, Tuple[Dict, Dict, bool]] = {}
+
+
+def _parquet():
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            _pyarrow = False
+        else:
+            _pyarrow = pyarrow
+    return _pyarrow or None
+
+
+def parquet_available() -> bool:
+    return _parquet() is not None
+
+
+def parquet_path(source: Path) -> Path:
+    """resources/wits.json -> resources/wits.parquet"""
+    return Path(source).with_suffix(PARQUET_SUFFIX)
+
+
+def write_parquet(
+    records: List[Dict],
+    path: Path,
+    row_group_size: int = SETTINGS.PARQUET_ROW_GROUP_SIZE,
+    source: Optional[Dict] = None,
+) -> bool:
+    """
+    Write the records to a parquet file, sorted on the timestamp (stable) if
+    they have one. Returns False (and writes nothing) if the records can not be
+    stored without changing them, e.g. when a key is missing in some records,
+    which would be read back as None.
+    source is the source_meta of the json file the records were read from.
+    """
+    pa = _parquet()
+    if pa is None:
+        raise ImportError("pyarrow is needed to write parquet files.")
+    if not records:
+        return False
+    if all("timestamp" in record for record in records):
+        records = sorted(records, key=lambda record: record["timestamp"])
+    try:
+        table = pa.Table.from_pylist(records)
+    except (pa.ArrowException, TypeError, ValueError):
+        return False
+    # e.g. ints and floats in one column are read back as floats
+    if json.dumps(table.to_pylist()) != json.dumps(records):
+        return False
+    if source is not None:
+        table = table.replace_schema_metadata({SOURCE_META_KEY: json.dumps(source)})
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    pa.parquet.write_table(
+        table, tmp_path, row_group_size=row_group_size, write_statistics=True
+    )
+    tmp_path.replace(path)
+    return True
+
+
+def read_parquet(
+    path: Path,
+    ts_min: Optional[int] = None,
+    ts_max: Optional[int] = None,
+    drill_string_id: Optional[Hashable] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read the records with ts_min <= timestamp < ts_max (and of a drillstring)
+    in timestamp order. The filters are checked against the row group
+    statistics first, so the row groups outside the window are not read.
+    """
+    pa = _parquet()
+    filters = []
+    if drill_string_id is not None and "drill_string_id" not in schema_fields(path):
+        # as in mongoDB, no record matches a filter on a missing key
+        return []
+    if ts_min is not None:
+        filters.append(("timestamp", ">=", ts_min))
+    if ts_max is not None:
+        filters.append(("timestamp", "<", ts_max))
+    if drill_string_id is not None:
+        filters.append(("drill_string_id", "==", drill_string_id))
+    table = pa.parquet.read_table(
+        path, columns=list(columns) if columns else None, filters=filters or None
+    )
+    return table.to_pylist()
+
+
+def is_current(path: Path, source: Path) -> bool:
+    """
+    True if the parquet copy was made from the json file as it is now. A copy
+    without the source metadata is not current; without the json file the
+    copy is the only data and is used.
+    """
+    path, source = Path(path), Path(source)
+    if not source.exists():
+        return True
+    metas = (source_meta(path), source_meta(source))
+    checked = _checked.get(path)
+    if checked is None or checked[:2] != metas:
+        metadata = _parquet().parquet.read_schema(path).metadata or {}
+        written_from = json.loads(metadata.get(SOURCE_META_KEY, b"null"))
+        checked = (*metas, written_from == metas[1])
+        _checked[path] = checked
+    return checked[2]
+
+
+def schema_fields(path: Path) -> frozenset:
+    """The columns of a parquet file (the keys of every record)."""
+    return frozenset(_parquet().parquet.read_schema(path).names)
+
+
+def row_groups(path: Path) -> int:
+    return _parquet().parquet.ParquetFile(path).num_row_groups
+
+
+def convert(source: Path, row_group_size: int = SETTINGS.PARQUET_ROW_GROUP_SIZE) -> bool:
+    """Write the parquet copy of a resource json file, returns False if it can not be stored."""
+    # taken before the read, a change during the conversion makes the copy stale
+    meta = source_meta(source)
+    with open(source) as f:
+        records = json.load(f)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return False
+    return write_parquet(
+        records, parquet_path(source), row_group_size=row_group_size, source=meta
+    )
+
+
+def convert_resources(
+    paths: Sequence[Path], row_group_size: int = SETTINGS.PARQUET_ROW_GROUP_SIZE
+) -> Dict[str, bool]:
+    """Convert every json file in the folders, the json files are kept as they are."""
+    converted = {}
+    for folder in paths:
+        for source in sorted(Path(folder).glob("*.json")):
+            converted[str(source)] = convert(source, row_group_size=row_group_size)
+            if converted[str(source)]:
+                logger.info(f"Converted {source} to {parquet_path(source)}")
+            else:
+                logger.info(f"Kept {source} as json only")
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", type=Path, nargs="*", default=[Path("resources")])
+    parser.add_argument(
+        "--row-group-size", type=int, default=SETTINGS.PARQUET_ROW_GROUP_SIZE
+    )
+    args = parser.parse_args()
+    if not parquet_available():
+        parser.error("pyarrow is not installed.")
+    for source, done in convert_resources(args.paths, args.row_group_size).items():
+        print(f"{source}: {'converted' if done else 'kept as json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,17 @@ class BGAppTasks(Enum):
     """Enum for app tasks"""
 
     CALCULATE_BG = ("calculate_bg", ["start_ts", "end_ts", "asset_id", "task"])
+    CALCULATE_BG_INCREMENTAL = (
+        "calculate_bg_incremental",
+        ["start_ts", "end_ts", "asset_id", "task"],
+    )
+    CALCULATE_BG_BATCH = ("calculate_bg_batch", ["assets", "task"])
     RETURN_CACHE = ("return_cache", ["asset_id", "task"])
     DELETE_CACHE = ("delete_cache", ["asset_id", "task"])
     DELETE_BG_COLLECTION = ("delete_bg_collection", ["asset_id", "task"])
     RETURN_APP_SETTING = ("get_app_setting", ["asset_id", "task"])
     EDIT_APP_SETTING = ("edit_app_setting", ["asset_id", "task", "new_setting"])
+    INVALIDATE_BHA_CACHE = ("invalidate_bha_cache", ["asset_id", "task"])
 
     def __new__(cls, *args, **kwargs):
         obj = object.__new__(cls)
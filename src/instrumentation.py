@@ -0,0 +1,230 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+from src.model import SETTINGS
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+STAGE_FIELDS = ("seconds", "calls", "rows", "bytes")
+
+# metrics of the run of the current context (see activate and submit)
+_current: contextvars.ContextVar = contextvars.ContextVar("bg_run_metrics", default=None)
+
+
+class RunMetrics:
+    """
+    Wall time, row and byte counts per stage and the external calls of one
+    BGApp.run. Stages can be added from several threads.
+    """
+
+    def __init__(self, task: Optional[str], asset_id: Hashable = None) -> None:
+        self.task = task
+        self.asset_id = asset_id
+        self.status = "ok"
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.external_calls: Dict[str, int] = {}
+        self.external_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self, stage: str, seconds: float = 0.0, calls: int = 0, rows: int = 0, bytes: int = 0
+    ) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, dict.fromkeys(STAGE_FIELDS, 0))
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+            entry["rows"] += rows
+            entry["bytes"] += bytes
+
+    def call(self, service: str, bytes: int = 0) -> None:
+        if not isinstance(bytes, int):
+            bytes = 0
+        with self._lock:
+            self.external_calls[service] = self.external_calls.get(service, 0) + 1
+            self.external_bytes[service] = self.external_bytes.get(service, 0) + bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "task": self.task,
+                "asset_id": self.asset_id,
+                "status": self.status,
+                "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+                "external_calls": dict(self.external_calls),
+                "external_bytes": dict(self.external_bytes),
+            }
+
+
+class TimedIterator:
+    """Wrap an iterator and add up the time spent waiting for its items."""
+
+    def __init__(self, iterable: Iterable) -> None:
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+        self.count = 0
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return item
+
+
+def current() -> Optional[RunMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def activate(metrics: RunMetrics):
+    """Make metrics the target of stage, add and count_call in this context."""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def submit(executor, fn, /, *args, **kwargs):
+    """executor.submit keeping the run metrics of the caller in the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def stage(name: str, rows: int = 0, bytes: int = 0):
+    """Time a block as one call of a stage of the current run (no-op outside a run)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, seconds=time.perf_counter() - start, calls=1, rows=rows, bytes=bytes)
+
+
+def add(stage: str, **values) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(stage, **values)
+
+
+def count_call(service: str, bytes: int = 0) -> None:
+    """Count a round trip to an external service (mongo, s3) of the current run."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.call(service, bytes=bytes)
+
+
+def to_emf(metrics: RunMetrics, timestamp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    The metrics as a CloudWatch embedded metric format document, with the
+    task as dimension and a {stage}_{field} metric per stage.
+    """
+    data = metrics.to_dict()
+    units = {"seconds": "Seconds", "calls": "Count", "rows": "Count", "bytes": "Bytes"}
+    document = {"task": str(data["task"]), "asset_id": data["asset_id"], "status": data["status"]}
+    definitions = []
+    for stage_name, entry in data["stages"].items():
+        for field, unit in units.items():
+            name = f"{stage_name}_{field}"
+            document[name] = entry[field]
+            definitions.append({"Name": name, "Unit": unit})
+    for service, calls in data["external_calls"].items():
+        document[f"{service}_calls"] = calls
+        definitions.append({"Name": f"{service}_calls", "Unit": "Count"})
+
+    document["_aws"] = {
+        "Timestamp": int((timestamp or time.time()) * 1000),
+        "CloudWatchMetrics": [
+            {
+                "Namespace": SETTINGS.METRICS_NAMESPACE,
+                "Dimensions": [["task"]],
+                "Metrics": definitions,
+            }
+        ],
+    }
+    return document
+
+
+class PrometheusRegistry:
+    """Process-wide totals of the runs, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def _inc(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, metrics: RunMetrics) -> None:
+        data = metrics.to_dict()
+        task = data["task"]
+        with self._lock:
+            self._inc("bgapp_runs_total", 1, task=task, status=data["status"])
+            for stage_name, entry in data["stages"].items():
+                for field in STAGE_FIELDS:
+                    self._inc(f"bgapp_stage_{field}_total", entry[field], task=task, stage=stage_name)
+            for service, calls in data["external_calls"].items():
+                self._inc("bgapp_external_calls_total", calls, task=task, service=service)
+                self._inc(
+                    "bgapp_external_bytes_total",
+                    data["external_bytes"][service],
+                    task=task,
+                    service=service,
+                )
+
+    def render(self) -> str:
+        lines = []
+        name = None
+        with self._lock:
+            for (key_name, labels), value in sorted(self._counters.items()):
+                if key_name != name:
+                    name = key_name
+                    lines.append(f"# TYPE {name} counter")
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+PROMETHEUS_REGISTRY = PrometheusRegistry()
+
+
+def emf_enabled() -> bool:
+    # lambda ships the stdout lines to CloudWatch, which extracts the EMF metrics
+    flag = os.environ.get("BG_METRICS_EMF")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+def prometheus_enabled() -> bool:
+    """The /metrics endpoint of the FastAPI app is served only if BG_PROMETHEUS_METRICS is set."""
+    return os.environ.get("BG_PROMETHEUS_METRICS", "").lower() in ("1", "true", "yes")
+
+
+def emit(metrics: RunMetrics) -> None:
+    """Log the metrics of a finished run as a JSON line (and EMF), and add them to the totals."""
+    logger.info(json.dumps({"message": "bg_app_metrics", **metrics.to_dict()}, default=str))
+    if emf_enabled():
+        print(json.dumps(to_emf(metrics), default=str), flush=True)
+    PROMETHEUS_REGISTRY.observe(metrics)
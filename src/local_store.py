@@ -0,0 +1,187 @@
+import json
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+INDEX_FOLDER = ".index"
+
+
+class LocalIndex:
+    """
+    Memory-mapped, timestamp sorted copy of a local resource json file.
+    It is built once from resources/{collection}.json into resources/.index/:
+    - {collection}.ts.npy: the timestamps sorted ascending (stable),
+    - {collection}.offsets.npy: the byte offset of each record in the records file,
+    - {collection}.jsonl: the records in timestamp order, one per line,
+    - {collection}.meta.json: size and mtime of the source to detect changes
+      and the fields present in every record.
+    A time window is found with a binary search on the timestamps and only
+    the records of the window are read and parsed.
+    """
+
+    def __init__(self, index_path: Path, name: str) -> None:
+        with open(index_path / f"{name}.meta.json") as f:
+            self.fields = frozenset(json.load(f)["fields"])
+        self._timestamps = np.load(index_path / f"{name}.ts.npy", mmap_mode="r")
+        self._offsets = np.load(index_path / f"{name}.offsets.npy", mmap_mode="r")
+        self._records_file = open(index_path / f"{name}.jsonl", "rb")
+        size = os.fstat(self._records_file.fileno()).st_size
+        self._records = (
+            mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if size
+            else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def window(
+        self, ts_min: Optional[int] = None, ts_max: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Return the (start, stop) positions of the records with ts_min <= timestamp < ts_max."""
+        start = 0 if ts_min is None else int(np.searchsorted(self._timestamps, ts_min, "left"))
+        stop = (
+            len(self) if ts_max is None else int(np.searchsorted(self._timestamps, ts_max, "left"))
+        )
+        return start, max(start, stop)
+
+    def limit(self, start: int, stop: int, limit: int, sort_ts: int) -> Tuple[int, int]:
+        """
+        Narrow (start, stop) to the records needed for the first `limit` records
+        in the sort order. Records with the same timestamp as the last one
+        needed are kept, so the caller can order the ties as before.
+        """
+        if not limit or stop - start <= limit:
+            return start, stop
+        if sort_ts == -1:
+            boundary_ts = self._timestamps[stop - limit]
+            return int(np.searchsorted(self._timestamps, boundary_ts, "left")), stop
+        boundary_ts = self._timestamps[start + limit - 1]
+        return start, int(np.searchsorted(self._timestamps, boundary_ts, "right"))
+
+    def read(self, start: int, stop: int) -> List[Dict]:
+        if start >= stop:
+            return []
+        begin, end = int(self._offsets[start]), int(self._offsets[stop])
+        chunk = self._records[begin:end]
+        return [json.loads(line) for line in chunk.splitlines()]
+
+    def iter_records(
+        self, start: int, stop: int, chunk_size: int, sort_ts: int = 1
+    ) -> Iterator[Dict]:
+        """
+        Yield the records of (start, stop) in the sort order, reading
+        chunk_size records at a time. In descending order a group of equal
+        timestamps is read in one chunk so the ties keep the order of sorted().
+        """
+        if sort_ts == -1:
+            while stop > start:
+                lo = max(start, stop - chunk_size)
+                lo = max(start, int(np.searchsorted(self._timestamps, self._timestamps[lo], "left")))
+                yield from sorted(self.read(lo, stop), key=lambda x: x["timestamp"], reverse=True)
+                stop = lo
+        else:
+            for lo in range(start, stop, chunk_size):
+                yield from self.read(lo, min(lo + chunk_size, stop))
+
+    def close(self) -> None:
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._records_file.close()
+
+
+def source_meta(source: Path) -> Dict:
+    """Size and mtime of a file, they change when the file is written."""
+    stat = os.stat(source)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_index(source: Path, index_path: Path) -> bool:
+    """
+    Convert a resource json file into the index files.
+    Returns False (and builds nothing) if a record has no timestamp.
+    """
+    name = source.stem
+    with open(source, "r") as f:
+        records = json.load(f)
+    if not all(isinstance(record, dict) and "timestamp" in record for record in records):
+        return False
+
+    fields = set(records[0]) if records else set()
+    for record in records:
+        fields.intersection_update(record)
+
+    timestamps = np.array([record["timestamp"] for record in records], dtype=np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+
+    index_path.mkdir(parents=True, exist_ok=True)
+    # write to temporary files and rename, so readers never see a partial index
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    records_tmp = index_path / f"{name}.jsonl{suffix}"
+    with open(records_tmp, "wb") as f:
+        for i, position in enumerate(order):
+            line = json.dumps(records[position]).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets[i + 1] = offsets[i] + len(line)
+
+    files = {
+        f"{name}.jsonl": records_tmp,
+        f"{name}.ts.npy": index_path / f"{name}.ts{suffix}.npy",
+        f"{name}.offsets.npy": index_path / f"{name}.offsets{suffix}.npy",
+        f"{name}.meta.json": index_path / f"{name}.meta.json{suffix}",
+    }
+    np.save(files[f"{name}.ts.npy"], timestamps[order])
+    np.save(files[f"{name}.offsets.npy"], offsets)
+    with open(files[f"{name}.meta.json"], "w") as f:
+        json.dump({**source_meta(source), "fields": sorted(fields)}, f)
+    # the meta file is renamed last, it marks the index as complete
+    for file_name, tmp_file in files.items():
+        os.replace(tmp_file, index_path / file_name)
+    logger.info(f"Built the local index of {source}")
+    return True
+
+
+_indexes: Dict[Path, Tuple[Dict, Optional[LocalIndex]]] = {}
+_lock = threading.Lock()
+
+
+def open_index(source: Path) -> Optional[LocalIndex]:
+    """
+    Return the index of a resource json file, building it if it is missing or
+    older than the source. Returns None for files that can not be indexed.
+    Open indexes are kept per process.
+    """
+    source = Path(source)
+    if not source.exists():
+        return None
+    index_path = source.parent / INDEX_FOLDER
+    meta = source_meta(source)
+    with _lock:
+        cached = _indexes.get(source)
+        if cached is not None and cached[0] == meta:
+            return cached[1]
+
+        meta_file = index_path / f"{source.stem}.meta.json"
+        indexed = False
+        if meta_file.exists():
+            with open(meta_file) as f:
+                built_from = json.load(f)
+            indexed = all(built_from.get(k) == v for k, v in meta.items())
+        if not indexed:
+            indexed = build_index(source, index_path)
+
+        index = LocalIndex(index_path, source.stem) if indexed else None
+        if cached is not None and cached[1] is not None:
+            cached[1].close()
+        _indexes[source] = (meta, index)
+        return index
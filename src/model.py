@@ -12,6 +12,54 @@ class Settings(BaseModel):
     CACHE_FILE_NAME = "cache.json"
     REGION_NAME = "us-east-2"
     RETURN_APP_SETTING = "app_setting.json"
+    # prefix of the cumulative bg state objects in the cache bucket
+    BG_STATE_PREFIX = "bg_state"
+    # seconds an app setting is served from memory before it is revalidated
+    APP_SETTING_TTL = 300
+    # seconds the drillstring to motor_cof map of an asset is cached
+    MOTOR_COF_TTL = 600
+    MONGO_DATABASE = "Drilling"
+    # number of BG records per bulk write
+    BG_WRITE_BATCH_SIZE = 1_000
+    # rows of a drillstring turned into BG records and posted at a time
+    BG_GRADE_CHUNK_SIZE = 10_000
+    # number of records per page of Api.iter_pages (keyset pagination)
+    PAGE_SIZE = 5_000
+    # records per row group of the local parquet files (see src/columnar_store.py)
+    PARQUET_ROW_GROUP_SIZE = 10_000
+    # threads of the concurrent reads in BGApp.calculate_BG
+    FETCH_WORKERS = 5
+    # assets graded at the same time by the calculate_bg_batch task
+    BATCH_WORKERS = 8
+    # seconds of wits per partition of a backfill (see src/backfill.py)
+    BACKFILL_PARTITION_SECONDS = 86_400
+    # CloudWatch namespace of the run metrics (see src/instrumentation.py)
+    METRICS_NAMESPACE = "BGApp"
+    # size of the request log file before it is rotated and the rotated files kept
+    # (see src/request_log.py, on only if BG_REQUEST_LOG is set)
+    REQUEST_LOG_MAX_BYTES = 50_000_000
+    REQUEST_LOG_BACKUPS = 5
+    # threads running the tasks of the FastAPI server (see src/task_runner.py)
+    SERVER_WORKERS = 32
+    # tasks of a type run at the same time by the server, the others wait
+    SERVER_TASK_CONCURRENCY = {
+        "calculate_bg": 8,
+        "calculate_bg_incremental": 8,
+        "calculate_bg_batch": 2,
+    }
+    SERVER_DEFAULT_TASK_CONCURRENCY = 16
+    # tasks whose identical concurrent events are run once by the server
+    SERVER_COALESCED_TASKS = (
+        "calculate_bg",
+        "calculate_bg_incremental",
+        "return_cache",
+        "get_app_setting",
+    )
+    # pool and timeout settings of the shared clients (see src/connections.py)
+    MONGO_MAX_POOL_SIZE = 10
+    MONGO_TIMEOUT_MS = 10_000
+    S3_MAX_POOL_CONNECTIONS = 10
+    S3_TIMEOUT = 10
 
 
 SETTINGS = Settings()
@@ -46,12 +94,8 @@ class Wits(BaseModel):
     # use Wits.__fields__.keys() to get the fields
     @staticmethod
     def check_fields(data: dict) -> bool:
-        fields = Wits.__fields__.keys()
-        # exclude drill_string_id and timestamp from the fields
-        fields = [
-            field for field in fields if field not in ["drill_string_id", "timestamp"]
-        ]
-        return all([data.get("data", {}).get(field) is not None for field in fields])
+        record_data = data.get("data", {})
+        return all(record_data.get(field) is not None for field in WITS_DATA_FIELDS)
 
     @staticmethod
     def check_activity(data: dict) -> bool:
@@ -59,6 +103,12 @@ class Wits(BaseModel):
             return True
 
 
+# the Wits fields that are read from the record data (all but drill_string_id and timestamp)
+WITS_DATA_FIELDS = tuple(
+    field for field in Wits.__fields__ if field not in ["drill_string_id", "timestamp"]
+)
+
+
 class DrillString(BaseModel):
     drill_string_id: str = Field(..., alias="_drill_string_id")
     down_hole_motor_id: str = None
@@ -86,6 +136,14 @@ class BitGrade(BaseModel):
     data: BitGradeData
 
 
+class BGState(BaseModel):
+    """The last graded timestamp and cumulative bg of a drillstring."""
+
+    drillstring_id: str = None
+    timestamp: int = None
+    bg: float = None
+
+
 # TODO: add more exceptions
 class EmptyCacheInS3(Exception):
     pass
@@ -93,3 +151,11 @@ class EmptyCacheInS3(Exception):
 
 class InvalidCacheInS3(Exception):
     pass
+
+
+class BGStateConflict(Exception):
+    pass
+
+
+class FailedToPostBG(Exception):
+    pass
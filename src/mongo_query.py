@@ -0,0 +1,178 @@
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# the values of ASCENDING and DESCENDING, so that building a
+# query does not import pymongo
+ASCENDING = 1
+DESCENDING = -1
+
+# collections whose records have a timestamp and are sorted/filtered on it
+TIMESTAMPED_COLLECTIONS = {"wits", "BG"}
+# collections whose records carry the asset_id
+ASSET_SCOPED_COLLECTIONS = {"wits", "BG"}
+
+WITS_INDEX = [("asset_id", ASCENDING), ("timestamp", ASCENDING)]
+# the key of the BG upserts
+BG_INDEX = [
+    ("asset_id", ASCENDING),
+    ("drillstring_id", ASCENDING),
+    ("timestamp", ASCENDING),
+]
+
+
+class MongoQuery(NamedTuple):
+    filter: Dict[str, Any]
+    projection: Optional[Dict[str, int]]
+    sort: Optional[List[Tuple[str, int]]]
+    limit: int
+
+
+def build_mongo_query(
+    query: Dict, collection_name: str, asset_id: Any = None
+) -> MongoQuery:
+    """
+    Turn the api query dict into a server side filter, projection, sort and limit.
+    The semantics are the same as the python side filtering in Api.get_data:
+    - the timestamp window [ts_min, ts_max) is used only if both are given,
+    - sort is 1 (ascending) or -1 (descending, default) on the timestamp,
+    - limit defaults to 10,
+    - fields are the keys kept in the records (_id is dropped unless asked for).
+    """
+    sort_ts = query.get("sort", {})
+    if not sort_ts:
+        sort_ts = -1  # descending order
+
+    limit = query.get("limit", {})
+    if not limit:
+        limit = 10
+
+    _filter = {}
+    asset_id = query.get("asset_id", asset_id)
+    if asset_id is not None and collection_name in ASSET_SCOPED_COLLECTIONS:
+        _filter["asset_id"] = asset_id
+
+    drill_string_id = query.get("drill_string_id")
+    if drill_string_id is not None:
+        _filter["drill_string_id"] = drill_string_id
+
+    ts_min = query.get("ts_min", {})
+    ts_max = query.get("ts_max", {})
+    if ts_min and ts_max:
+        # check both the timestamp are not equal otherwise it rises an error
+        if ts_min == ts_max:
+            raise ValueError("ts_min and ts_max are equal.")
+        _filter["timestamp"] = {"$gte": ts_min, "$lt": ts_max}
+
+    projection = None
+    fields = query.get("fields", {})
+    if fields:
+        projection = {field: 1 for field in fields}
+        if "_id" not in fields:
+            projection["_id"] = 0
+
+    sort = None
+    if collection_name in TIMESTAMPED_COLLECTIONS:
+        sort = [("timestamp", ASCENDING if sort_ts == 1 else DESCENDING)]
+
+    return MongoQuery(filter=_filter, projection=projection, sort=sort, limit=limit)
+
+
+def keyset_page(
+    mongo_query: MongoQuery, page_size: int, after: Optional[Tuple] = None
+) -> MongoQuery:
+    """
+    The query of one page of a keyset pagination over mongo_query.
+    Pages are sorted on (timestamp, _id), or _id for collections without a
+    timestamp, and after is the key of the last record of the previous page,
+    so a page is found with the index instead of skipping the earlier pages.
+    The limit of mongo_query is not used, the pages cover all the records.
+    """
+    direction = mongo_query.sort[0][1] if mongo_query.sort else ASCENDING
+    keys = [key for key, _ in mongo_query.sort or []] + ["_id"]
+    sort = [(key, direction) for key in keys]
+
+    _filter = mongo_query.filter
+    if after is not None:
+        op = "$gt" if direction == ASCENDING else "$lt"
+        # records after the key in the sort order: the first key is larger, or
+        # equal with a larger second key and so on
+        conditions = []
+        for i, key in enumerate(keys):
+            condition = {keys[j]: after[j] for j in range(i)}
+            condition[key] = {op: after[i]}
+            conditions.append(condition)
+        _filter = {"$and": [_filter, {"$or": conditions}]}
+
+    # _id is needed for the key of the next page
+    projection = mongo_query.projection
+    if projection is not None:
+        projection = {k: v for k, v in projection.items() if k != "_id"}
+
+    return MongoQuery(filter=_filter, projection=projection, sort=sort, limit=page_size)
+
+
+def ensure_indexes(collection) -> None:
+    """
+    Create the compound (asset_id, timestamp) index used by the window queries.
+    create_index is a no-op if the index already exists.
+    """
+    collection.create_index(WITS_INDEX, name="asset_id_timestamp")
+
+
+def dedupe_bg_records(collection) -> int:
+    """
+    Delete the BG records that repeat an (asset_id, drillstring_id, timestamp)
+    key, left by the former insert_many writes, keeping the last inserted one.
+    Returns the number of deleted records.
+    """
+    duplicates = collection.aggregate(
+        [
+            {
+                "$group": {
+                    "_id": {key: f"${key}" for key, _ in BG_INDEX},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+    deleted = 0
+    for group in duplicates:
+        # the ObjectIds grow with the insertion time
+        stale_ids = sorted(group["ids"])[:-1]
+        deleted += collection.delete_many({"_id": {"$in": stale_ids}}).deleted_count
+    return deleted
+
+
+def ensure_bg_indexes(collection, dedupe: bool = False) -> bool:
+    """
+    Create the unique (asset_id, drillstring_id, timestamp) index of the BG upserts,
+    after deleting the duplicated records with dedupe. If the collection still
+    has duplicates a warning is logged and False is returned: the upserts work
+    without the index, they are only slower and not atomic.
+    """
+    # pymongo is loaded with the client, not when the module is imported
+    import pymongo.errors
+
+    if dedupe:
+        logger.info(f"Deleted {dedupe_bg_records(collection)} duplicated BG records")
+    try:
+        collection.create_index(
+            BG_INDEX, name="asset_id_drillstring_id_timestamp", unique=True
+        )
+    except pymongo.errors.OperationFailure as e:
+        if e.code != 11000:
+            raise
+        logger.warning(
+            "The BG collection has duplicated (asset_id, drillstring_id, timestamp) "
+            "records, the unique index was not created. Run ensure_bg_indexes with "
+            "dedupe=True to delete them."
+        )
+        return False
+    return True
@@ -0,0 +1,73 @@
+import logging
+from concurrent.futures import Executor
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from src import instrumentation
+from src.caching import TTLCache
+from src.model import SETTINGS, DownholeMotor, DrillString
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class MotorCofResolver:
+    """
+    Map of drill_string_id to the motor_cof of its down-hole motor per asset.
+    Rigs change BHAs rarely, so the map is cached for a ttl and refreshed early
+    only if a drillstring is missing or the cache is invalidated (the
+    invalidate_bha_cache task). Invalidation is per process, other warm
+    containers pick up the change when their ttl expires.
+    """
+
+    def __init__(self, ttl: float = SETTINGS.MOTOR_COF_TTL, **kwargs) -> None:
+        self._cache = TTLCache(ttl, **kwargs)
+
+    @staticmethod
+    def join(
+        ds_records: List[DrillString], dhm_records: List[DownholeMotor]
+    ) -> Dict[str, float]:
+        # index the motors by motor_id, then look up each drillstring
+        motor_cofs = {dhm.motor_id: dhm.motor_cof for dhm in dhm_records}
+        return {
+            ds.drill_string_id: motor_cofs[ds.down_hole_motor_id]
+            for ds in ds_records
+            if ds.down_hole_motor_id in motor_cofs
+        }
+
+    def get(
+        self,
+        asset_id: Hashable,
+        get_ds_data: Callable[[], List[DrillString]],
+        get_downhole_motor_data: Callable[[], List[DownholeMotor]],
+        drill_string_ids: Iterable[str] = (),
+        executor: Optional[Executor] = None,
+    ) -> Dict[str, float]:
+        """
+        Return the cached map of the asset, or fetch the drillstrings and motors
+        and join them. With an executor both are fetched at the same time.
+        """
+        ds_dhm_cof_map = self._cache.get(asset_id)
+        if ds_dhm_cof_map is not None and all(
+            ds in ds_dhm_cof_map for ds in drill_string_ids
+        ):
+            return ds_dhm_cof_map
+
+        logger.info(f"Resolving the motor coefficients of {asset_id}")
+        if executor is None:
+            ds_dhm_cof_map = self.join(get_ds_data(), get_downhole_motor_data())
+        else:
+            dhm_future = instrumentation.submit(executor, get_downhole_motor_data)
+            ds_dhm_cof_map = self.join(get_ds_data(), dhm_future.result())
+        self._cache.set(asset_id, ds_dhm_cof_map)
+        return ds_dhm_cof_map
+
+    def invalidate(self, asset_id: Hashable) -> None:
+        self._cache.invalidate(asset_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# shared between the runs of the same process (warm lambda invocations)
+MOTOR_COF_RESOLVER = MotorCofResolver()
@@ -0,0 +1,131 @@
+"""
+Opt-in JSON lines log of the events handled by the FastAPI, Flask and lambda
+entry points, with their timing and result size, to replay production load
+offline (see benchmarks/replay_requests.py). It is off unless the environment
+variable BG_REQUEST_LOG is the path of the log file. The file is rotated at
+SETTINGS.REQUEST_LOG_MAX_BYTES, keeping SETTINGS.REQUEST_LOG_BACKUPS old files.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.model import SETTINGS
+
+REQUEST_LOG_ENV = "BG_REQUEST_LOG"
+
+_lock = threading.Lock()
+_logs: Dict[str, "RequestLog"] = {}
+
+
+class RequestLog:
+    """Append one json line per request to a rotating file (thread safe)."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = SETTINGS.REQUEST_LOG_MAX_BYTES,
+        backups: int = SETTINGS.REQUEST_LOG_BACKUPS,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backups
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=str)
+        # handle takes the lock of the handler around the rollover and the write
+        self._handler.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+class LoggedRequest:
+    """What the entry point knows about the request, set inside logged_request."""
+
+    def __init__(self) -> None:
+        self.result: Any = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+
+def get_request_log() -> Optional[RequestLog]:
+    """The log of the BG_REQUEST_LOG path, or None if the request log is off."""
+    path = os.getenv(REQUEST_LOG_ENV)
+    if not path:
+        return None
+    with _lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = RequestLog(path)
+    return log
+
+
+def close_request_logs() -> None:
+    with _lock:
+        for log in _logs.values():
+            log.close()
+        _logs.clear()
+
+
+def _result_bytes(result: Any) -> int:
+    if result is None:
+        return 0
+    return len(json.dumps(result, default=str))
+
+
+@contextmanager
+def logged_request(source: str, event: Dict) -> Iterator[LoggedRequest]:
+    """
+    Time the handling of an event and append it to the request log with its
+    timing, status and the size of the result (set request.result in the block).
+    Nothing is done if the request log is off.
+    """
+    log = get_request_log()
+    request = LoggedRequest()
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield request
+    except Exception as e:
+        request.status = "failed"
+        request.error = repr(e)
+        raise
+    finally:
+        if log is not None:
+            log.append(
+                {
+                    "ts": started_at,
+                    "source": source,
+                    "event": event,
+                    "seconds": time.perf_counter() - start,
+                    "status": request.status,
+                    "error": request.error,
+                    "result_bytes": _result_bytes(request.result),
+                }
+            )
+
+
+def read_request_log(path: Path) -> List[Dict[str, Any]]:
+    """The entries of a log and its rotated files (path.1, path.2, ...) in time order."""
+    path = Path(path)
+    backups = sorted(
+        (p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True,
+    )
+    entries = []
+    for file in [*backups, path]:
+        if not file.exists():
+            continue
+        with open(file) as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return sorted(entries, key=lambda entry: entry["ts"])
@@ -0,0 +1,49 @@
+import logging
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from src.caching import TTLCache
+from src.model import SETTINGS
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# fetch(etag) returns (etag, setting) or (etag, None) if the object is not modified
+SettingFetcher = Callable[[Optional[str]], Tuple[Optional[str], Optional[Dict]]]
+
+
+class AppSettingsCache:
+    """
+    Cache of the app settings per asset_id.
+    A fresh entry is served without touching S3. Once the entry is older than
+    the ttl, it is revalidated with a conditional get using the stored ETag so
+    an unchanged app_setting.json is not downloaded again.
+    """
+
+    def __init__(self, ttl: float = SETTINGS.APP_SETTING_TTL, **kwargs) -> None:
+        self._cache = TTLCache(ttl, **kwargs)
+
+    def get(self, asset_id: Hashable, fetch: SettingFetcher) -> Dict:
+        entry = self._cache.get(asset_id)
+        if entry is not None:
+            return entry[1]
+
+        stale_entry = self._cache.peek(asset_id)
+        etag = stale_entry[0] if stale_entry else None
+        new_etag, app_setting = fetch(etag)
+        if app_setting is None and stale_entry:
+            logger.info(f"App setting for {asset_id} is not modified.")
+            new_etag, app_setting = etag, stale_entry[1]
+
+        self._cache.set(asset_id, (new_etag, app_setting))
+        return app_setting
+
+    def invalidate(self, asset_id: Hashable) -> None:
+        self._cache.invalidate(asset_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# shared between the runs of the same process (warm lambda invocations)
+APP_SETTINGS_CACHE = AppSettingsCache()
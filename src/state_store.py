@@ -0,0 +1,277 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from src import instrumentation
+from src.connections import get_s3_resource
+from src.model import SETTINGS, BGState, BGStateConflict
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+States = Dict[str, BGState]
+
+
+class BGStateStore(ABC):
+    """
+    Keyed store of the cumulative bg state per (asset_id, drillstring_id).
+    All the drillstrings of an asset are kept in one versioned document, so
+    resuming a run is a single read. Writes are conditional on the version
+    that was read; on a conflict the document is read again, merged (the
+    latest timestamp of a drillstring wins) and written again.
+    Reads go through an in-process cache that lives as long as the store;
+    a run starts with refresh, which revalidates the cached version against
+    the stored one, so the writes of other processes are seen.
+    """
+
+    max_retries = 5
+
+    def __init__(self) -> None:
+        self._cache: Dict[Hashable, Tuple[Optional[str], States]] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _read(self, asset_id: Hashable) -> Tuple[Optional[str], States]:
+        """Return (version, states) of an asset, version is None if there is no state."""
+
+    @abstractmethod
+    def _write(
+        self, asset_id: Hashable, states: States, version: Optional[str]
+    ) -> Optional[str]:
+        """Write the states if the stored version is still version, return the new version."""
+
+    @abstractmethod
+    def _remove(self, asset_id: Hashable) -> None:
+        """Delete the states of an asset."""
+
+    def _revalidate(
+        self, asset_id: Hashable, version: Optional[str]
+    ) -> Optional[Tuple[Optional[str], States]]:
+        """Return None if the stored version is still version, else the stored (version, states)."""
+        entry = self._read(asset_id)
+        return None if entry[0] == version else entry
+
+    def _load(self, asset_id: Hashable) -> Tuple[Optional[str], States]:
+        with self._lock:
+            entry = self._cache.get(asset_id)
+        if entry is None:
+            entry = self._read(asset_id)
+            with self._lock:
+                self._cache[asset_id] = entry
+        return entry
+
+    def refresh(self, asset_id: Hashable) -> States:
+        """Revalidate the cached state of an asset and return its states."""
+        with self._lock:
+            entry = self._cache.get(asset_id)
+        if entry is not None:
+            fresh = self._revalidate(asset_id, entry[0])
+            if fresh is not None:
+                with self._lock:
+                    self._cache[asset_id] = fresh
+        return self.get_all(asset_id)
+
+    def get_all(self, asset_id: Hashable) -> States:
+        _, states = self._load(asset_id)
+        return dict(states)
+
+    def get(self, asset_id: Hashable, drillstring_id: str) -> Optional[BGState]:
+        _, states = self._load(asset_id)
+        return states.get(drillstring_id)
+
+    def put(self, asset_id: Hashable, new_states: Iterable[BGState]) -> None:
+        new_states = list(new_states)
+        version, states = self._load(asset_id)
+        for _ in range(self.max_retries):
+            merged = dict(states)
+            for state in new_states:
+                current = merged.get(state.drillstring_id)
+                if current is None or current.timestamp <= state.timestamp:
+                    merged[state.drillstring_id] = state
+            try:
+                new_version = self._write(asset_id, merged, version)
+            except BGStateConflict:
+                logger.info(f"BG state of {asset_id} changed, merging and retrying.")
+                version, states = self._read(asset_id)
+                continue
+            with self._lock:
+                self._cache[asset_id] = (new_version, merged)
+            return
+        with self._lock:
+            self._cache.pop(asset_id, None)
+        raise BGStateConflict(f"Could not update the bg state of {asset_id}.")
+
+    def delete(self, asset_id: Hashable) -> None:
+        self._remove(asset_id)
+        self.invalidate(asset_id)
+
+    def invalidate(self, asset_id: Hashable = None) -> None:
+        """Drop the cached state of an asset (or of all assets)."""
+        with self._lock:
+            if asset_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(asset_id, None)
+
+
+def _dump(states: States) -> str:
+    return json.dumps({ds: state.dict() for ds, state in states.items()})
+
+
+def _load_states(document: Dict) -> States:
+    return {ds: BGState(**state) for ds, state in document.items()}
+
+
+class S3StateStore(BGStateStore):
+    """State documents are S3 objects, writes use If-Match / If-None-Match."""
+
+    def __init__(
+        self, bucket_name: str = None, prefix: str = SETTINGS.BG_STATE_PREFIX
+    ) -> None:
+        super().__init__()
+        self._bucket_name = bucket_name or SETTINGS.CACHE_BUCKET_NAME
+        self._prefix = prefix
+
+    def _key(self, asset_id: Hashable) -> str:
+        return f"{self._prefix}/{asset_id}.json"
+
+    def _read(self, asset_id: Hashable) -> Tuple[Optional[str], States]:
+        # botocore is loaded with the S3 resource, not when the module is imported
+        import botocore.exceptions
+
+        s3_client = get_s3_resource().meta.client
+        instrumentation.count_call("s3")
+        try:
+            s3_object = s3_client.get_object(
+                Bucket=self._bucket_name, Key=self._key(asset_id)
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, {}
+            raise
+        body = s3_object["Body"].read().decode("utf-8")
+        return s3_object["ETag"], _load_states(json.loads(body))
+
+    def _revalidate(
+        self, asset_id: Hashable, version: Optional[str]
+    ) -> Optional[Tuple[Optional[str], States]]:
+        if version is None:
+            return super()._revalidate(asset_id, version)
+        import botocore.exceptions
+
+        # a conditional get, the document is downloaded only if it was changed
+        s3_client = get_s3_resource().meta.client
+        instrumentation.count_call("s3")
+        try:
+            s3_object = s3_client.get_object(
+                Bucket=self._bucket_name, Key=self._key(asset_id), IfNoneMatch=version
+            )
+        except botocore.exceptions.ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("304", "NotModified"):
+                return None
+            if code in ("NoSuchKey", "404"):
+                return None, {}
+            raise
+        body = s3_object["Body"].read().decode("utf-8")
+        return s3_object["ETag"], _load_states(json.loads(body))
+
+    def _write(
+        self, asset_id: Hashable, states: States, version: Optional[str]
+    ) -> Optional[str]:
+        import botocore.exceptions
+
+        s3_client = get_s3_resource().meta.client
+        condition = {"IfMatch": version} if version else {"IfNoneMatch": "*"}
+        instrumentation.count_call("s3")
+        try:
+            response = s3_client.put_object(
+                Bucket=self._bucket_name,
+                Key=self._key(asset_id),
+                Body=_dump(states),
+                **condition,
+            )
+        except botocore.exceptions.ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                raise BGStateConflict(f"BG state of {asset_id} was changed.")
+            raise
+        return response.get("ETag")
+
+    def _remove(self, asset_id: Hashable) -> None:
+        s3_client = get_s3_resource().meta.client
+        instrumentation.count_call("s3")
+        s3_client.delete_object(Bucket=self._bucket_name, Key=self._key(asset_id))
+
+
+class LocalFileStateStore(BGStateStore):
+    """
+    State documents are json files in a local folder (tests, local runs).
+    The version is a counter in the file; a lock file makes the
+    compare-and-write atomic between processes.
+    """
+
+    def __init__(self, path) -> None:
+        super().__init__()
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, asset_id: Hashable) -> Path:
+        return self._path / f"{asset_id}.json"
+
+    def _read(self, asset_id: Hashable) -> Tuple[Optional[str], States]:
+        try:
+            with open(self._file(asset_id)) as f:
+                document = json.load(f)
+        except FileNotFoundError:
+            return None, {}
+        return str(document["version"]), _load_states(document["states"])
+
+    def _write(
+        self, asset_id: Hashable, states: States, version: Optional[str]
+    ) -> Optional[str]:
+        with open(self._path / f"{asset_id}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current_version, _ = self._read(asset_id)
+            if current_version != version:
+                raise BGStateConflict(f"BG state of {asset_id} was changed.")
+            new_version = str(int(version or 0) + 1)
+            tmp_file = self._file(asset_id).with_suffix(".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(
+                    {
+                        "version": int(new_version),
+                        "states": {ds: state.dict() for ds, state in states.items()},
+                    },
+                    f,
+                )
+            os.replace(tmp_file, self._file(asset_id))
+        return new_version
+
+    def _remove(self, asset_id: Hashable) -> None:
+        try:
+            os.remove(self._file(asset_id))
+        except FileNotFoundError:
+            pass
+
+
+_default_store: Optional[BGStateStore] = None
+
+
+def get_state_store() -> BGStateStore:
+    """The process wide S3 state store, its cache survives warm lambda invocations."""
+    global _default_store
+    if _default_store is None:
+        _default_store = S3StateStore()
+    return _default_store
+
+
+def reset_state_store() -> None:
+    global _default_store
+    _default_store = None
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.model import SETTINGS
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+
+# Initialize the logger
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class TaskRunner:
+    """
+    Run BGApp tasks for an asyncio server without blocking its event loop.
+    The tasks run in a thread pool, at most concurrency[task] of a task type at
+    the same time (the other requests wait on the event loop, not in a thread),
+    and identical concurrent events of the coalesced tasks are run once, all
+    the requests get the result (or the error) of the same run.
+    """
+
+    def __init__(
+        self,
+        api: Optional[Api] = None,
+        max_workers: int = SETTINGS.SERVER_WORKERS,
+        concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = SETTINGS.SERVER_DEFAULT_TASK_CONCURRENCY,
+        coalesced_tasks=SETTINGS.SERVER_COALESCED_TASKS,
+    ) -> None:
+        self._api = api or Api()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bg_task"
+        )
+        self._concurrency = dict(SETTINGS.SERVER_TASK_CONCURRENCY, **(concurrency or {}))
+        self._default_concurrency = default_concurrency
+        self._coalesced_tasks = set(coalesced_tasks)
+        self._semaphores: Dict[Any, asyncio.Semaphore] = {}
+        # runs of the coalesced events, by event
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _semaphore(self, task: Any) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(task)
+        if semaphore is None:
+            limit = self._concurrency.get(task, self._default_concurrency)
+            semaphore = self._semaphores[task] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def _run(self, event: Dict) -> Any:
+        async with self._semaphore(event.get("task")):
+            loop = asyncio.get_running_loop()
+            bg_app = BGApp(self._api, event)
+            return await loop.run_in_executor(self._executor, bg_app.run)
+
+    async def run(self, event: Dict) -> Any:
+        """Run the task of the event and return what BGApp.run returns."""
+        if event.get("task") not in self._coalesced_tasks:
+            return await self._run(event)
+
+        key = json.dumps(event, sort_keys=True, default=str)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(event))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.info(f"Joining the running {event.get('task')} of {event.get('asset_id')}")
+        # a cancelled request (client gone) does not cancel the run of the others
+        return await asyncio.shield(future)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def close(self) -> None:
+        """Wait for the running tasks and stop the threads."""
+        self._executor.shutdown(wait=True)
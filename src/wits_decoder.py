@@ -0,0 +1,75 @@
+from typing import Any, Dict, Iterable, Iterator
+
+from src.model import ACCEPTED_ACTIVITIES, Wits
+
+_ACCEPTED_ACTIVITIES = frozenset(ACCEPTED_ACTIVITIES)
+
+
+class WitsRow:
+    """
+    A parsed wits record with the same attributes as the Wits model.
+    It is a plain __slots__ object, so decoding a record does not build a
+    pydantic model. Use to_wits to get the public Wits model.
+    """
+
+    __slots__ = tuple(Wits.__fields__)
+
+    def __init__(
+        self,
+        timestamp: int,
+        drill_string_id: str,
+        md: float,
+        wob: float,
+        rpm: float,
+        rop: float,
+        flowrate: float,
+    ) -> None:
+        self.timestamp = timestamp
+        self.drill_string_id = drill_string_id
+        self.md = md
+        self.wob = wob
+        self.rpm = rpm
+        self.rop = rop
+        self.flowrate = flowrate
+
+    def to_wits(self) -> Wits:
+        return Wits(**{field: getattr(self, field) for field in self.__slots__})
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, WitsRow):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"WitsRow({fields})"
+
+
+def decode_wits(records: Iterable[Dict]) -> Iterator[WitsRow]:
+    """
+    Validate and parse raw wits records in one pass.
+    Same filter as Wits.check_fields and Wits.check_activity: a record is kept
+    if its activity is accepted and none of md, wob, rpm, rop and flowrate is
+    missing or None in its data.
+    """
+    for record in records:
+        if record.get("activity") not in _ACCEPTED_ACTIVITIES:
+            continue
+        data = record.get("data", {})
+        md = data.get("md")
+        wob = data.get("wob")
+        rpm = data.get("rpm")
+        rop = data.get("rop")
+        flowrate = data.get("flowrate")
+        if md is None or wob is None or rpm is None or rop is None or flowrate is None:
+            continue
+        timestamp = record.get("timestamp")
+        yield WitsRow(
+            int(timestamp) if timestamp is not None else None,
+            record.get("drill_string_id"),
+            float(md),
+            float(wob),
+            float(rpm),
+            float(rop),
+            float(flowrate),
+        )
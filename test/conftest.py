@@ -0,0 +1,39 @@
+from unittest.mock import Mock
+
+import mongomock
+import pytest
+
+from src.connections import reset_clients, set_mongo_client, set_s3_resource
+from src.motor_resolver import MOTOR_COF_RESOLVER
+from src.settings_cache import APP_SETTINGS_CACHE
+from src.state_store import reset_state_store
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+    # the pooled clients and caches live at module level, so tests that mock
+    # boto3 or pymongo must not see the clients made by an earlier test
+    reset_clients()
+    reset_state_store()
+    APP_SETTINGS_CACHE.clear()
+    MOTOR_COF_RESOLVER.clear()
+    yield
+    reset_clients()
+    reset_state_store()
+    APP_SETTINGS_CACHE.clear()
+    MOTOR_COF_RESOLVER.clear()
+
+
+@pytest.fixture
+def mongo_client():
+    # an empty in-memory mongoDB used as the pooled client
+    client = mongomock.MongoClient()
+    set_mongo_client(client)
+    return client
+
+
+@pytest.fixture
+def s3():
+    s3 = Mock()
+    set_s3_resource(s3)
+    return s3
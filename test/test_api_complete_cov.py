@@ -68,7 +68,7 @@ def test_raise_value_error_query(api):
     assert str(e.value) == "Query is not provided."
 
 
-def records_func():
+def records_func(*args, **kwargs):
     # raed the data from the local location
     path = Path(__file__).parent / ".." / "resources"
     collection_name = "wits"
@@ -79,7 +79,7 @@ def records_func():
 
 def test_raise_value_error_query_no_sort(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
     # mocker.patch.object(Api, "get_data", side_effect=records)
 
@@ -103,7 +103,7 @@ def test_raise_value_error_query_no_sort(api, mocker):
 
 def test_raise_value_error_query_sort_asc(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
     # mocker.patch.object(Api, "get_data", side_effect=records)
 
@@ -127,7 +127,7 @@ def test_raise_value_error_query_sort_asc(api, mocker):
 
 def test_raise_value_error_query_no_limit(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
 
     query = {
@@ -148,7 +148,7 @@ def test_raise_value_error_query_no_limit(api, mocker):
     assert len(records) == 10
 
 
-def not_all_fields():
+def not_all_fields(*args, **kwargs):
     # raed the data from the local location
     path = Path(__file__).parent / ".." / "resources"
     collection_name = "wits_not_all_fields_present"
@@ -159,7 +159,7 @@ def not_all_fields():
 
 def test_raise_value_error_not_all_fields_present(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=not_all_fields
+        "pymongo.collection.Collection.find", side_effect=not_all_fields
     )
 
     with pytest.raises(ValueError) as e:
@@ -182,7 +182,7 @@ def test_raise_value_error_not_all_fields_present(api, mocker):
 
 def test_ts_min_max_eq(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
 
     with pytest.raises(ValueError) as e:
@@ -207,7 +207,7 @@ def test_ts_min_max_eq(api, mocker):
 
 def test_query_with_ts_min_max(api, mocker):
     mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
 
     query = {
@@ -237,13 +237,14 @@ def test_query_with_ts_min_max(api, mocker):
 def test_post(api, query, mocker):
     # module class module class method!
     mongodb_find_mocker = mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.find", side_effect=records_func
+        "pymongo.collection.Collection.find", side_effect=records_func
     )
-    mongodb_insert_many_mocker = mocker.patch(
-        "src.osu_api.pymongo.collection.Collection.insert_many", return_value=None
+    mongodb_bulk_write_mocker = mocker.patch(
+        "pymongo.collection.Collection.bulk_write"
     )
+    mocker.patch("pymongo.collection.Collection.create_index")
 
-    boto3_mocker = mocker.patch("src.osu_api.boto3")
+    boto3_mocker = mocker.patch("src.connections.boto3")
     boto3_mocker.client.return_value = boto3_mocker
 
     records = api.get_data(
@@ -255,8 +256,8 @@ def test_post(api, query, mocker):
 
     api.post_data(data=records)
     mongodb_find_mocker.assert_called_once()
-    # assert that the insert_many method is called
-    mongodb_insert_many_mocker.assert_called_once()
+    # assert that the bulk_write method is called
+    mongodb_bulk_write_mocker.assert_called_once()
 
 
 class Boto3Obj:
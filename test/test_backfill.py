@@ -0,0 +1,138 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.backfill
+from src import bg_engine
+from src.backfill import backfill, plan_partitions, stitch_partition
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+from src.wits_decoder import decode_wits
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+ASSET_ID = 123456789
+BWC = 30_000_000_000_000
+START_TS = 1677112069
+END_TS = 1677115069
+
+
+@pytest.fixture
+def mongo_client(mongo_client, s3):
+    for collection_name, file_name in [
+        ("drillstring", "ds_data.json"),
+        ("downhole_motor", "dhm_data.json"),
+    ]:
+        with open(RESOURCES_PATH / file_name) as f:
+            mongo_client["Drilling"][collection_name].insert_many(json.load(f))
+    return mongo_client
+
+
+def single_pass():
+    # the whole history graded at once
+    with open(RESOURCES_PATH / "wits.json") as f:
+        records = json.load(f)
+    with open(RESOURCES_PATH / "ds_data.json") as f:
+        motors = {ds["_drill_string_id"]: ds["down_hole_motor_id"] for ds in json.load(f)}
+    with open(RESOURCES_PATH / "dhm_data.json") as f:
+        cofs = {dhm["motor_id"]: dhm["motor_cof"] for dhm in json.load(f)}
+    grouped = bg_engine.group_by_drillstring(decode_wits(records))
+    return {
+        ds: bg_engine.to_bit_grade_records(
+            columns.timestamp,
+            ds,
+            bg_engine.cumulative_bit_grade(
+                columns.wob, columns.rpm, columns.flowrate, cofs[motors[ds]], BWC
+            ),
+        )
+        for ds, columns in grouped.items()
+    }
+
+
+def test_plan_partitions():
+    assert plan_partitions(0, 25, 10) == [(0, 10), (10, 20), (20, 25)]
+    assert plan_partitions(0, 0, 10) == []
+
+
+def test_stitch_partition_is_a_prefix_sum():
+    rng = np.random.default_rng(16)
+    values = rng.random(100)
+    cuts = [0, 7, 8, 40, 100]
+    totals = {}
+    stitched = [
+        stitch_partition({"ds_1": (np.arange(lo, hi), np.cumsum(values[lo:hi]))}, totals, 12)
+        for lo, hi in zip(cuts, cuts[1:])
+    ]
+    timestamps = np.concatenate([partition["ds_1"][0] for partition in stitched])
+    bit_grades = np.concatenate([partition["ds_1"][1] for partition in stitched])
+    np.testing.assert_array_equal(timestamps, np.arange(100))
+    np.testing.assert_allclose(bit_grades, np.cumsum(values), rtol=0, atol=1e-11)
+    assert totals["ds_1"] == pytest.approx(values.sum())
+
+
+def test_backfill_matches_a_single_pass(mongo_client, tmp_path, mocker):
+    store = LocalFileStateStore(tmp_path)
+    pool = mocker.spy(src.backfill, "ProcessPoolExecutor")
+    post_bg = mocker.spy(BGApp, "post_bg")
+    summary = backfill(
+        ASSET_ID,
+        START_TS,
+        END_TS,
+        bit_wear_constant=BWC,
+        partition_seconds=300,
+        max_workers=2,
+        read_from_mongo=False,
+        api_kwargs={"resources_path": RESOURCES_PATH},
+        state_store=store,
+    )
+    expected = single_pass()
+    assert summary["partitions"] == 10
+    assert summary["bg_records"] == {ds: len(records) for ds, records in expected.items()}
+    # the workers do not inherit the clients of the parent
+    assert pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+    # every partition is posted on its own, in time order
+    posted_chunks = [call.args[1] for call in post_bg.call_args_list]
+    assert len(posted_chunks) >= summary["partitions"]
+    assert [chunk[0]["timestamp"] for chunk in posted_chunks] == sorted(
+        chunk[0]["timestamp"] for chunk in posted_chunks
+    )
+
+    posted = list(mongo_client["Drilling"]["BG"].find({}, {"_id": 0, "asset_id": 0}))
+    for ds, records in expected.items():
+        backfilled = [record for record in posted if record["drillstring_id"] == ds]
+        assert [r["timestamp"] for r in backfilled] == [r["timestamp"] for r in records]
+        # partition sums are added in another order, the rounded bg may differ by a unit
+        np.testing.assert_allclose(
+            [r["data"]["bg"] for r in backfilled],
+            [r["data"]["bg"] for r in records],
+            rtol=0,
+            atol=1.001e-3,
+        )
+        state = store.get(ASSET_ID, ds)
+        assert (state.timestamp, state.bg) == (
+            backfilled[-1]["timestamp"],
+            backfilled[-1]["data"]["bg"],
+        )
+
+
+def test_backfill_without_posting(mongo_client, tmp_path):
+    store = LocalFileStateStore(tmp_path)
+    summary = backfill(
+        ASSET_ID,
+        START_TS,
+        START_TS + 600,
+        api=Api(resources_path=RESOURCES_PATH),
+        bit_wear_constant=BWC,
+        partition_seconds=120,
+        max_workers=1,
+        read_from_mongo=False,
+        api_kwargs={"resources_path": RESOURCES_PATH},
+        state_store=store,
+        post=False,
+    )
+    assert summary["partitions"] == 5
+    assert sum(summary["bg_records"].values()) > 0
+    assert mongo_client["Drilling"]["BG"].count_documents({}) == 0
+    assert store.get_all(ASSET_ID) == {}
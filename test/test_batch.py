@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import app_flask
+from src.model import EmptyCacheInS3
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+START_TS = 1677112070
+
+
+def get_data(*args, **kwargs):
+    with open(RESOURCES_PATH / f"{kwargs['data_name']}.json") as f:
+        records = json.load(f)
+    query = kwargs["query"]
+    if "ts_min" in query:
+        records = [
+            record
+            for record in records
+            if query["ts_min"] <= record["timestamp"] < query["ts_max"]
+        ]
+    return records
+
+
+def iter_pages(*args, **kwargs):
+    if kwargs["asset_id"] == "broken_rig":
+        raise ConnectionError("wits not reachable")
+    yield get_data(*args, **kwargs)
+
+
+@pytest.fixture
+def posted(mocker):
+    mocker.patch("src.p03_1_app.Api.get_data", side_effect=get_data)
+    mocker.patch("src.p03_1_app.Api.iter_pages", side_effect=iter_pages)
+    mocker.patch("src.p03_1_app.BGApp.get_cache", side_effect=EmptyCacheInS3())
+    mocker.patch(
+        "src.p03_1_app.BGApp.load_settings",
+        return_value={"data": {"bit_wear_constant": 30_000_000_000_000}},
+    )
+    posted = []
+    mocker.patch("src.p03_1_app.BGApp.post_bg", side_effect=posted.extend)
+    return posted
+
+
+def batch_event(assets, **kwargs):
+    return {"task": "calculate_bg_batch", "assets": assets, **kwargs}
+
+
+def test_batch_grades_every_asset(posted, tmp_path):
+    store = LocalFileStateStore(tmp_path / "single")
+    window = {"start_ts": START_TS, "end_ts": START_TS + 600}
+    BGApp(Api(), {"asset_id": 1, "task": "calculate_bg", **window}, state_store=store).run()
+    single = list(posted)
+    posted.clear()
+
+    store = LocalFileStateStore(tmp_path / "batch")
+    assets = [{"asset_id": asset_id} for asset_id in (1, 2, 3)]
+    statuses = BGApp(Api(), batch_event(assets, **window), state_store=store).run()
+
+    assert statuses == [
+        {"asset_id": asset_id, **window, "status": "ok", "bg_records": len(single)}
+        for asset_id in (1, 2, 3)
+    ]
+    assert len(posted) == 3 * len(single)
+    for asset_id in (1, 2, 3):
+        assert store.get_all(asset_id) == store.get_all(1)
+
+
+def test_windows_of_an_asset_run_in_order(posted, tmp_path):
+    windows = [
+        {"start_ts": ts, "end_ts": ts + 300} for ts in range(START_TS, START_TS + 1500, 300)
+    ]
+    store = LocalFileStateStore(tmp_path / "sequential")
+    for window in windows:
+        BGApp(Api(), {"asset_id": 1, "task": "calculate_bg", **window}, state_store=store).run()
+    sequential = list(posted)
+    posted.clear()
+
+    store = LocalFileStateStore(tmp_path / "batch")
+    assets = [{"asset_id": 1, **window} for window in windows]
+    BGApp(Api(), batch_event(assets, max_workers=4), state_store=store).run()
+    assert posted == sequential
+
+
+def test_failed_asset_does_not_stop_the_batch(posted, tmp_path):
+    assets = [
+        {"asset_id": "broken_rig", "start_ts": START_TS, "end_ts": START_TS + 60},
+        {"asset_id": "broken_rig", "start_ts": START_TS + 60, "end_ts": START_TS + 120},
+        {"asset_id": 1, "start_ts": START_TS, "end_ts": START_TS + 60},
+    ]
+    store = LocalFileStateStore(tmp_path)
+    statuses = BGApp(Api(), batch_event(assets), state_store=store).run()
+
+    assert [status["status"] for status in statuses] == ["failed", "skipped", "ok"]
+    assert statuses[0]["error"] == "wits not reachable"
+    assert statuses[2]["bg_records"] > 0
+
+
+def test_batch_incremental(posted, tmp_path):
+    store = LocalFileStateStore(tmp_path)
+    event = batch_event(
+        [{"asset_id": 1}], start_ts=START_TS, end_ts=START_TS + 120, incremental=True
+    )
+    first = BGApp(Api(), event, state_store=store).run()
+    again = BGApp(Api(), event, state_store=store).run()
+    assert first[0]["bg_records"] > 0
+    assert again[0] == {**first[0], "bg_records": 0}
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"task": "calculate_bg_batch"},
+        batch_event([{"asset_id": 1}]),
+        batch_event([{"start_ts": START_TS, "end_ts": START_TS + 60}]),
+    ],
+)
+def test_batch_missing_items(posted, event, tmp_path):
+    with pytest.raises(ValueError, match="Missing items in the event"):
+        BGApp(Api(), event, state_store=LocalFileStateStore(tmp_path)).run()
+
+
+@pytest.mark.parametrize("max_workers", [0, -1])
+def test_batch_rejects_max_workers_below_one(posted, max_workers, tmp_path):
+    event = batch_event([{"asset_id": 1, "start_ts": START_TS, "end_ts": START_TS + 60}], max_workers=max_workers)
+    with pytest.raises(ValueError, match="max_workers must be at least 1"):
+        BGApp(Api(), event, state_store=LocalFileStateStore(tmp_path)).run()
+
+
+def test_batch_through_flask(mocker):
+    events = []
+    mocker.patch(
+        "src.p03_1_app.BGApp.run", autospec=True, side_effect=lambda bg_app: events.append(bg_app._event)
+    )
+    assets = [{"asset_id": 1}, {"asset_id": 2, "start_ts": START_TS + 60}]
+    response = app_flask.app.test_client().post("/task", json=batch_event(assets, max_workers=2))
+    assert response.status_code == 200
+    [event] = events
+    assert event["task"] == "calculate_bg_batch"
+    assert event["assets"] == assets
+    assert event["max_workers"] == 2
+    assert "incremental" not in event
@@ -0,0 +1,126 @@
+import random
+
+import numpy as np
+import pytest
+
+from src import bg_engine
+from src.model import BitGrade, BitGradeData, Wits
+
+BIT_WEAR_CONSTANT = 30_000_000_000_000
+
+
+def reference_cumulative_bit_grade(wobs, rpms, flowrates, motor_cof, offset=0):
+    # the per record implementation that the engine replaces
+    bit_grades = [
+        wob * (rpm + flowrate * motor_cof) / BIT_WEAR_CONSTANT
+        for wob, rpm, flowrate in zip(wobs, rpms, flowrates)
+    ]
+    cumulative = [sum(bit_grades[: i + 1]) for i in range(len(bit_grades))]
+    if offset:
+        cumulative = [bg + offset for bg in cumulative]
+    return [round(bg, 3) for bg in cumulative]
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(42)
+    size = 500
+    return (
+        rng.uniform(0, 50_000, size),
+        rng.uniform(0, 350, size),
+        rng.uniform(0, 500, size),
+    )
+
+
+@pytest.mark.parametrize("offset", [0, 0.712])
+def test_cumulative_bit_grade_matches_reference(columns, offset):
+    wobs, rpms, flowrates = columns
+    bit_grades = bg_engine.cumulative_bit_grade(
+        wobs, rpms, flowrates, 442.96, BIT_WEAR_CONSTANT, offset=offset
+    )
+    expected = reference_cumulative_bit_grade(
+        wobs.tolist(), rpms.tolist(), flowrates.tolist(), 442.96, offset=offset
+    )
+    assert bit_grades.tolist() == expected
+
+
+def test_cumulative_bit_grade_empty():
+    empty = np.array([], dtype=float)
+    bit_grades = bg_engine.cumulative_bit_grade(
+        empty, empty, empty, 442.96, BIT_WEAR_CONSTANT, offset=1.0
+    )
+    assert bit_grades.size == 0
+
+
+def test_to_bit_grade_records_matches_model():
+    records = bg_engine.to_bit_grade_records(
+        [1677112071, 1677112073], "ds_1", np.array([0.005, 0.006])
+    )
+    expected = [
+        BitGrade(
+            timestamp=ts,
+            provider="osu_provider",
+            drillstring_id="ds_1",
+            data=BitGradeData(bg=bg),
+        ).dict()
+        for ts, bg in [(1677112071, 0.005), (1677112073, 0.006)]
+    ]
+    assert records == expected
+    assert type(records[0]["data"]["bg"]) is float
+
+
+def reference_group_by_drillstring(records):
+    # group by drillstring and sort each group by timestamp (stable)
+    groups = {}
+    for record in records:
+        groups.setdefault(record.drill_string_id, []).append(record)
+    return {
+        ds: sorted(ds_records, key=lambda x: x.timestamp)
+        for ds, ds_records in groups.items()
+    }
+
+
+def random_wits_records(rng):
+    drill_strings = [f"ds_{i}" for i in range(1, rng.randint(1, 5) + 1)]
+    records = [
+        Wits(
+            timestamp=1677112069 + rng.randint(0, 50),
+            drill_string_id=rng.choice(drill_strings),
+            md=rng.uniform(0, 10_000),
+            wob=rng.uniform(0, 50_000),
+            rpm=rng.uniform(0, 350),
+            rop=rng.uniform(0, 300),
+            flowrate=rng.uniform(0, 500),
+        )
+        for _ in range(rng.randint(0, 60))
+    ]
+    if rng.random() < 0.5:
+        # in order by timestamp with the drillstrings interleaved
+        records.sort(key=lambda x: x.timestamp)
+    return records
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_group_by_drillstring_matches_reference(seed):
+    records = random_wits_records(random.Random(seed))
+    groups = bg_engine.group_by_drillstring(records)
+    expected = reference_group_by_drillstring(records)
+
+    assert list(groups) == list(expected)
+    for ds, columns in groups.items():
+        assert columns.drill_string_id == ds
+        assert len(columns) == len(expected[ds])
+        assert columns.timestamp.tolist() == [r.timestamp for r in expected[ds]]
+        assert columns.wob.tolist() == [r.wob for r in expected[ds]]
+        assert columns.rpm.tolist() == [r.rpm for r in expected[ds]]
+        assert columns.flowrate.tolist() == [r.flowrate for r in expected[ds]]
+
+
+def test_group_by_drillstring_keeps_interleaved_rows():
+    records = [
+        Wits(timestamp=ts, drill_string_id=ds, wob=1, rpm=1, flowrate=1)
+        for ts, ds in [(1, "ds_1"), (2, "ds_2"), (3, "ds_1"), (4, "ds_2"), (5, "ds_1")]
+    ]
+    groups = bg_engine.group_by_drillstring(records)
+    assert groups["ds_1"].timestamp.tolist() == [1, 3, 5]
+    assert groups["ds_2"].timestamp.tolist() == [2, 4]
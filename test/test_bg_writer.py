@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+
+import mongomock
+import pymongo.errors
+import pytest
+
+from src.model import FailedToPostBG
+from src.mongo_query import ensure_bg_indexes
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+
+
+def bg_records(drillstring_id, timestamps, bg=0.1):
+    return [
+        {
+            "timestamp": ts,
+            "provider": "osu_provider",
+            "drillstring_id": drillstring_id,
+            "data": {"bg": bg},
+        }
+        for ts in timestamps
+    ]
+
+
+@pytest.fixture
+def bg_collection(mongo_client):
+    return mongo_client["Drilling"]["BG"]
+
+
+def test_post_data_in_batches(bg_collection, s3, mocker):
+    bulk_write = mocker.spy(mongomock.collection.Collection, "bulk_write")
+    data = bg_records("ds_1", range(25))
+    counts = Api().post_data(data=data, asset_id=1, batch_size=10)
+
+    assert counts == {"inserted": 25, "updated": 0, "failed": 0}
+    assert bulk_write.call_count == 3
+    assert bg_collection.count_documents({"asset_id": 1}) == 25
+    # the records posted are not changed (no _id is added)
+    assert "_id" not in data[0]
+    # the cached last record tells its asset
+    s3.Object.return_value.put.assert_called_once_with(
+        Body=json.dumps({**data[-1], "asset_id": 1})
+    )
+
+
+def test_post_data_is_idempotent(bg_collection, s3):
+    api = Api()
+    api.post_data(data=bg_records("ds_1", range(10)), asset_id=1)
+    counts = api.post_data(data=bg_records("ds_1", range(5, 15), bg=0.2), asset_id=1)
+
+    assert counts == {"inserted": 5, "updated": 5, "failed": 0}
+    assert bg_collection.count_documents({}) == 15
+    assert bg_collection.find_one({"timestamp": 7}, {"_id": 0})["data"] == {"bg": 0.2}
+    # posting the same values again matches the records but does not change them
+    counts = api.post_data(data=bg_records("ds_1", range(5, 15), bg=0.2), asset_id=1)
+    assert counts == {"inserted": 0, "updated": 0, "failed": 0}
+    # the same timestamp of another drillstring or asset is another record
+    api.post_data(data=bg_records("ds_2", [7]), asset_id=1)
+    api.post_data(data=bg_records("ds_1", [7]), asset_id=2)
+    assert bg_collection.count_documents({"timestamp": 7}) == 3
+
+
+def test_legacy_duplicates_do_not_break_the_posts(bg_collection, s3, mocker, caplog):
+    mocker.patch("src.osu_api._indexed_collections", set())
+    # the records of the former insert_many: no asset_id, written twice
+    legacy = bg_records("ds_1", range(3))
+    bg_collection.insert_many([dict(record) for record in legacy + legacy])
+    bg_collection.insert_many([{**record, "asset_id": 1} for record in legacy[:2] * 2])
+
+    counts = Api().post_data(data=bg_records("ds_1", range(5, 8)), asset_id=1)
+    assert counts == {"inserted": 3, "updated": 0, "failed": 0}
+    assert "unique index was not created" in caplog.text
+    assert "asset_id_drillstring_id_timestamp" not in bg_collection.index_information()
+
+    last_ids = {}
+    for record in bg_collection.find({"timestamp": 0}):
+        last_ids[record.get("asset_id")] = record["_id"]
+    assert ensure_bg_indexes(bg_collection, dedupe=True)
+    assert "asset_id_drillstring_id_timestamp" in bg_collection.index_information()
+    assert bg_collection.count_documents({}) == 3 + 2 + 3
+    # the last inserted record of a key is kept
+    assert {record["_id"] for record in bg_collection.find({"timestamp": 0})} == set(last_ids.values())
+
+
+def test_calculate_bg_twice_on_the_same_window(bg_collection, s3, tmp_path, mocker):
+    mydb = bg_collection.database
+    for collection_name, file_name in [
+        ("wits", "wits.json"),
+        ("drillstring", "ds_data.json"),
+        ("downhole_motor", "dhm_data.json"),
+    ]:
+        with open(RESOURCES_PATH / file_name) as f:
+            mydb[collection_name].insert_many(json.load(f))
+    mocker.patch(
+        "src.p03_1_app.BGApp.fetch_setting",
+        return_value=("etag", {"data": {"bit_wear_constant": 30_000_000_000_000}}),
+    )
+    event = {"start_ts": 1677112070, "end_ts": 1677112670, "asset_id": 123456789, "task": "calculate_bg"}
+    state_store = LocalFileStateStore(tmp_path)
+
+    BGApp(Api(), event, state_store=state_store).run()
+    graded = list(bg_collection.find({}, {"_id": 0}, sort=[("drillstring_id", 1), ("timestamp", 1)]))
+    states = state_store.get_all(123456789)
+
+    # a retried run posts the same values, the records are matched and left unchanged
+    post_data = mocker.spy(Api, "post_data")
+    BGApp(Api(), event, state_store=state_store).run()
+    assert [result["updated"] for result in post_data.spy_return_list] == [0] * len(states)
+    assert list(bg_collection.find({}, {"_id": 0}, sort=[("drillstring_id", 1), ("timestamp", 1)])) == graded
+    assert state_store.refresh(123456789) == states
+
+
+def test_cache_is_not_written_if_a_batch_fails(bg_collection, s3, mocker):
+    mocker.patch.object(
+        mongomock.collection.Collection,
+        "bulk_write",
+        side_effect=pymongo.errors.BulkWriteError(
+            {"writeErrors": [{"index": 0}], "nUpserted": 9, "nMatched": 0}
+        ),
+    )
+    counts = Api().post_data(data=bg_records("ds_1", range(10)), asset_id=1)
+    assert counts == {"inserted": 9, "updated": 0, "failed": 1}
+    s3.Object.return_value.put.assert_not_called()
+
+
+def test_post_bg_raises_on_failed_records(mocker):
+    mocker.patch(
+        "src.p03_1_app.Api.post_data",
+        return_value={"inserted": 9, "updated": 0, "failed": 1},
+    )
+    bg_app = BGApp(Api(), {"asset_id": 1, "task": "calculate_bg"})
+    with pytest.raises(FailedToPostBG):
+        bg_app.post_bg(bg_records("ds_1", range(10)))
+
+
+def test_post_empty_data(bg_collection, s3):
+    assert Api().post_data(data=[], asset_id=1) == {
+        "inserted": 0,
+        "updated": 0,
+        "failed": 0,
+    }
+    s3.Object.assert_not_called()
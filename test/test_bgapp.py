@@ -1,4 +1,5 @@
 import json
+import tempfile
 import unittest
 from pathlib import Path
 from typing import Dict, List
@@ -10,6 +11,7 @@ import pymongo
 import src.p03_1_app
 from src.osu_api import Api
 from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
 
 
 class MongoDBMock:
@@ -52,6 +54,11 @@ class TestApp(unittest.TestCase):
     def setUp(self) -> None:
         self.resources_path = Path(__file__).parent / ".." / "resources"
         self.api = Api(resources_path=self.resources_path)
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.state_store = LocalFileStateStore(self.state_dir.name)
+
+    def tearDown(self) -> None:
+        self.state_dir.cleanup()
 
     def get_data(self, *args, **kwargs) -> List[Dict]:
         if kwargs.get("data_name") == "wits":
@@ -130,7 +137,7 @@ class TestApp(unittest.TestCase):
         }
         return setting
 
-    @mock.patch.object(src.p03_1_app.BGApp, "return_setting")
+    @mock.patch.object(src.p03_1_app.BGApp, "load_settings")
     @mock.patch.object(src.p03_1_app.BGApp, "get_cache")
     @mock.patch.object(src.p03_1_app.BGApp, "post_bg")
     @mock.patch.object(pymongo, "MongoClient")
@@ -139,12 +146,12 @@ class TestApp(unittest.TestCase):
         mock_api_get_data_method,
         mock_bgapp_post_method,
         mock_bgapp_get_cache_method,
-        mock_bgapp_return_setting_method,
+        mock_bgapp_load_settings_method,
     ):
         mock_api_get_data_method.side_effect = MongoDBMock
         mock_bgapp_post_method.side_effect = self.post_bg
         mock_bgapp_get_cache_method.side_effect = self.get_cache
-        mock_bgapp_return_setting_method.side_effect = TestApp.return_setting
+        mock_bgapp_load_settings_method.side_effect = TestApp.return_setting
 
         start_ts = 1677112070
         end_ts = 1677115068  # this is the final wits timestamp
@@ -168,7 +175,7 @@ class TestApp(unittest.TestCase):
                 "asset_id": 123456789,
                 "task": "calculate_bg",
             }
-            bg_app = BGApp(self.api, event)
+            bg_app = BGApp(self.api, event, state_store=self.state_store)
             bg_app.run()
 
         assert mock_api_get_data_method.called
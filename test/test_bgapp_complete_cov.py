@@ -75,7 +75,7 @@ class CustomObject:
 
 
 def test_get_cache_1(api, mocker):
-    boto3_resource = mocker.patch("src.p03_1_app.boto3.resource")
+    boto3_resource = mocker.patch("src.connections.boto3.resource")
     boto3_resource.return_value.Object.return_value.get.return_value = CustomObject()
 
     event = {
@@ -121,7 +121,7 @@ def return_cache(*args):
 
 # or just mock the json.loads method
 def test_get_cache_3(api, mocker):
-    mocker.patch("src.p03_1_app.boto3", return_value=None)
+    mocker.patch("src.connections.boto3", return_value=None)
     # patch the json and call the return_cache function
     mocker.patch("json.loads", side_effect=return_cache)
     event = {
@@ -137,7 +137,7 @@ def test_get_cache_3(api, mocker):
 
 
 def test_delete_cache(api, mocker):
-    boto3_resources_mocker = mocker.patch("src.p03_1_app.boto3.resource")
+    boto3_resources_mocker = mocker.patch("src.connections.boto3.resource")
     s3_object_mocker = boto3_resources_mocker.return_value.Object.return_value
     event = {
         "start_ts": 1677112070,
@@ -154,7 +154,7 @@ def test_delete_cache(api, mocker):
 
 @pytest.mark.skip(reason="needs edit")
 def test(api, mocker):
-    with mocker.patch("src.p03_1_app.boto3.resource") as boto3_resources_mocker:
+    with mocker.patch("src.connections.boto3.resource") as boto3_resources_mocker:
         # s3_object_mocker = boto3_resources_mocker.return_value.Object.return_value
         event = {
             "start_ts": 1677112070,
@@ -179,7 +179,7 @@ def delete_function(*args):
 
 def test_delete_bg_collection(api, mocker):
     mocker_delete_many = mocker.patch(
-        "src.p03_1_app.pymongo.collection.Collection.delete_many",
+        "pymongo.collection.Collection.delete_many",
         side_effect=delete_function,
     )
     event = {
@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+import lambda_function
+from benchmarks.bench_import import GET_APP_SETTING, IMPORT, REPORT
+
+ROOT = Path(__file__).parent / ".."
+
+
+def loaded_modules(code: str):
+    completed = subprocess.run(
+        [sys.executable, "-c", code + REPORT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1].replace("'", '"'))
+
+
+def test_import_does_not_load_the_client_libraries():
+    loaded = loaded_modules(IMPORT)
+    assert "pymongo" not in loaded
+    assert "boto3" not in loaded
+    assert "botocore" not in loaded
+
+
+def test_get_app_setting_does_not_load_pymongo():
+    assert "pymongo" not in loaded_modules(GET_APP_SETTING)
+
+
+def test_api_is_kept_between_invocations(s3, mocker):
+    s3.Object.return_value.get.side_effect = lambda: {
+        "Body": Mock(read=Mock(return_value=b'{"data": {}}')),
+        "ETag": "etag",
+    }
+    mocker.patch.object(lambda_function, "_api", None)
+    event = {"body": json.dumps({"asset_id": 1, "task": "get_app_setting"})}
+
+    assert lambda_function.lambda_handler(event) == {"data": {}}
+    api = lambda_function.get_api()
+    assert lambda_function.lambda_handler(event) == {"data": {}}
+    assert lambda_function.get_api() is api
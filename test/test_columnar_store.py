@@ -0,0 +1,133 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src import columnar_store, osu_api
+from src.columnar_store import convert_resources, read_parquet, row_groups
+from src.osu_api import Api
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+FIELDS = ["timestamp", "provider", "drill_string_id", "data", "activity"]
+START_TS = 1677112070
+
+
+@pytest.fixture
+def resources(tmp_path):
+    for file_name in ("wits.json", "ds_data.json", "dhm_data.json"):
+        shutil.copy(RESOURCES_PATH / file_name, tmp_path)
+    shutil.copy(
+        RESOURCES_PATH / "wits_not_all_fields_present.json", tmp_path / "BG.json"
+    )
+    converted = convert_resources([tmp_path], row_group_size=250)
+    assert converted[str(tmp_path / "wits.json")]
+    return tmp_path
+
+
+def test_converter_keeps_records_it_can_not_store(resources):
+    # some of the records miss keys, they would come back with None values
+    assert not (resources / "BG.parquet").exists()
+    assert (resources / "ds_data.parquet").exists()
+
+
+@pytest.mark.parametrize("sort", [1, -1])
+@pytest.mark.parametrize("limit", [1, 10, 100_000])
+@pytest.mark.parametrize("window", [None, (START_TS, START_TS + 600)])
+def test_parquet_matches_json(resources, sort, limit, window):
+    query = {"sort": sort, "limit": limit, "fields": FIELDS}
+    if window:
+        query.update(ts_min=window[0], ts_max=window[1])
+    kwargs = dict(provider_name="osu_provider", data_name="wits", query=query)
+    parquet = Api(resources_path=resources)
+    plain = Api(resources_path=resources, columnar=False, local_index=False)
+    assert parquet.get_data(**kwargs) == plain.get_data(**kwargs)
+    assert list(parquet.iter_pages(**kwargs, page_size=100)) == list(
+        plain.iter_pages(**kwargs, page_size=100)
+    )
+
+
+def test_window_reads_skip_row_groups(resources):
+    path = resources / "wits.parquet"
+    assert row_groups(path) == 12
+    metadata = pq.ParquetFile(path).metadata
+    timestamp = metadata.schema.names.index("timestamp")
+    statistics = [
+        metadata.row_group(i).column(timestamp).statistics for i in range(row_groups(path))
+    ]
+    assert all(s.has_min_max for s in statistics)
+    # the row groups are in timestamp order, a window overlaps a few of them
+    assert all(a.max <= b.min for a, b in zip(statistics, statistics[1:]))
+
+    records = read_parquet(path, ts_min=START_TS, ts_max=START_TS + 60)
+    assert [r["timestamp"] for r in records] == sorted(r["timestamp"] for r in records)
+    assert all(START_TS <= r["timestamp"] < START_TS + 60 for r in records)
+    records = read_parquet(path, drill_string_id="ds_2", columns=["timestamp"])
+    assert records and all(set(r) == {"timestamp"} for r in records)
+
+
+def test_missing_field_raises(resources):
+    query = {"sort": 1, "fields": ["timestamp", "rop"], "ts_min": START_TS, "ts_max": START_TS + 5}
+    with pytest.raises(ValueError, match="Not all fields are present"):
+        Api(resources_path=resources).get_data(
+            provider_name="osu_provider", data_name="wits", query=query
+        )
+
+
+@pytest.mark.parametrize("local_index", [True, False])
+def test_edited_json_is_read_instead_of_its_copy(resources, local_index, mocker):
+    query = {"sort": 1, "limit": 2, "fields": ["timestamp", "data"]}
+    kwargs = {"provider_name": "osu_provider", "data_name": "wits", "query": query}
+    with open(resources / "wits.json") as f:
+        records = json.load(f)
+    for record in records:
+        record["data"]["wob"] = 1.0
+    with open(resources / "wits.json", "w") as f:
+        json.dump(records, f)
+
+    edited = Api(resources_path=resources, columnar=False).get_data(**kwargs)
+    assert [record["data"]["wob"] for record in edited] == [1.0, 1.0]
+    assert Api(resources_path=resources, local_index=local_index).get_data(**kwargs) == edited
+
+    read = mocker.spy(osu_api, "read_parquet")
+    Api(resources_path=resources).get_data(**kwargs)
+    read.assert_not_called()
+    # a new copy of the edited file is used again
+    convert_resources([resources])
+    assert Api(resources_path=resources).get_data(**kwargs) == edited
+    read.assert_called_once()
+
+
+def test_json_is_used_without_pyarrow(resources, mocker):
+    mocker.patch.object(columnar_store, "_pyarrow", False)
+    read = mocker.patch("src.osu_api.read_parquet")
+    query = {"sort": 1, "limit": 5, "fields": FIELDS}
+    records = Api(resources_path=resources).get_data(
+        provider_name="osu_provider", data_name="wits", query=query
+    )
+    assert len(records) == 5
+    read.assert_not_called()
+
+
+def test_save_data(tmp_path):
+    api = Api(resources_path=tmp_path)
+    records = [
+        {"timestamp": 2, "drillstring_id": "ds_1", "data": {"bg": 0.5}},
+        {"timestamp": 1, "drillstring_id": "ds_1", "data": {"bg": 0.25}},
+    ]
+    written = api.save_data(data_name="BG", data=records)
+    assert written == [tmp_path / "BG.json", tmp_path / "BG.parquet"]
+    with open(tmp_path / "BG.json") as f:
+        assert json.load(f) == records
+
+    query = {"sort": 1, "limit": 10, "fields": ["timestamp", "data"]}
+    assert api.get_data(provider_name="p", data_name="BG", query=query) == [
+        {"timestamp": 1, "data": {"bg": 0.25}},
+        {"timestamp": 2, "data": {"bg": 0.5}},
+    ]
+
+    # records parquet can not hold, the stale copy is removed
+    api.save_data(data_name="BG", data=[{"timestamp": 1}, {"drillstring_id": "ds_1"}])
+    assert not (tmp_path / "BG.parquet").exists()
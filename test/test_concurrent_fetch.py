@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.model import SETTINGS, DownholeMotor, DrillString
+from src.motor_resolver import MotorCofResolver
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+
+EVENT = {
+    "start_ts": 1677112070,
+    "end_ts": 1677112070 + 60,
+    "asset_id": 123456789,
+    "task": "calculate_bg",
+}
+DS = [DrillString(_drill_string_id="ds_1", down_hole_motor_id="motor_id_1")]
+DHM = [DownholeMotor(motor_id="motor_id_1", motor_cof=400.0, type="positive_displacement")]
+
+
+def test_calculate_bg_reads_concurrently(mocker, tmp_path):
+    # every read waits until all five are in flight, sequential reads would time out
+    barrier = threading.Barrier(5, timeout=5)
+
+    def wait(result):
+        def read(*args, **kwargs):
+            barrier.wait()
+            return result
+
+        return read
+
+    mocker.patch("src.p03_1_app.BGApp.fetch_wits_records", side_effect=wait(iter([])))
+    mocker.patch("src.p03_1_app.BGApp.get_ds_data", side_effect=wait(DS))
+    mocker.patch("src.p03_1_app.BGApp.get_downhole_motor_data", side_effect=wait(DHM))
+    mocker.patch("src.p03_1_app.BGApp.load_settings", side_effect=wait({"data": {}}))
+    store = LocalFileStateStore(tmp_path)
+    mocker.patch.object(store, "get_all", side_effect=wait({}))
+    calculate_bit_grade = mocker.patch("src.p03_1_app.BGApp.calculate_bit_grade")
+
+    BGApp(Api(), EVENT, state_store=store).calculate_BG()
+
+    calculate_bit_grade.assert_called_once_with(
+        {}, {"ds_1": 400.0}, {"data": {}}, _return=False
+    )
+
+
+def test_motor_read_does_not_wait_for_the_pool(mocker, tmp_path):
+    # both threads of the pool wait for the motors
+    mocker.patch.object(SETTINGS, "FETCH_WORKERS", 2)
+    motors_read = threading.Event()
+
+    def get_downhole_motor_data():
+        motors_read.set()
+        return DHM
+
+    def fetch_wits_records(*args, **kwargs):
+        assert motors_read.wait(timeout=5)
+        return iter([])
+
+    mocker.patch("src.p03_1_app.BGApp.fetch_wits_records", side_effect=fetch_wits_records)
+    mocker.patch("src.p03_1_app.BGApp.get_ds_data", return_value=DS)
+    mocker.patch(
+        "src.p03_1_app.BGApp.get_downhole_motor_data", side_effect=get_downhole_motor_data
+    )
+    mocker.patch("src.p03_1_app.BGApp.load_settings", return_value={"data": {}})
+    calculate_bit_grade = mocker.patch("src.p03_1_app.BGApp.calculate_bit_grade")
+
+    BGApp(Api(), EVENT, state_store=LocalFileStateStore(tmp_path)).calculate_BG()
+    calculate_bit_grade.assert_called_once()
+
+
+def test_fetch_workers_below_two_are_rejected(mocker):
+    mocker.patch.object(SETTINGS, "FETCH_WORKERS", 1)
+    with pytest.raises(ValueError, match="FETCH_WORKERS"):
+        BGApp(Api(), EVENT).calculate_BG()
+
+
+def test_resolver_fetches_drillstrings_and_motors_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get_ds_data():
+        barrier.wait()
+        return DS
+
+    def get_downhole_motor_data():
+        barrier.wait()
+        return DHM
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        cof_map = MotorCofResolver().get(
+            1, get_ds_data, get_downhole_motor_data, executor=executor
+        )
+    assert cof_map == {"ds_1": 400.0}
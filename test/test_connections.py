@@ -0,0 +1,68 @@
+import threading
+
+import mongomock
+import pymongo
+
+from src import connections
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+
+
+def test_mongo_client_is_created_once(mocker):
+    mongo_client_mocker = mocker.patch.object(pymongo, "MongoClient")
+    client = connections.get_mongo_client()
+    assert connections.get_mongo_client() is client
+    assert connections.get_collection("wits") is connections.get_collection("wits")
+    mongo_client_mocker.assert_called_once()
+    _, kwargs = mongo_client_mocker.call_args
+    assert kwargs["maxPoolSize"] == 10
+    assert kwargs["serverSelectionTimeoutMS"] == 10_000
+
+
+def test_pool_settings_from_env(mocker, monkeypatch):
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    mongo_client_mocker = mocker.patch.object(pymongo, "MongoClient")
+    connections.get_mongo_client()
+    args, kwargs = mongo_client_mocker.call_args
+    assert args == ("mongodb://localhost:27017",)
+    assert kwargs["maxPoolSize"] == 50
+
+
+def test_s3_resource_is_reused_per_thread(mocker):
+    resource_mocker = mocker.patch("src.connections.boto3.resource")
+    resource_mocker.side_effect = lambda *args, **kwargs: object()
+    s3 = connections.get_s3_resource()
+    assert connections.get_s3_resource() is s3
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(connections.get_s3_resource()))
+    thread.start()
+    thread.join()
+    assert other[0] is not s3
+    assert resource_mocker.call_count == 2
+
+    connections.reset_clients()
+    assert connections.get_s3_resource() is not s3
+
+
+def test_one_client_per_run(mocker):
+    mongo_client_mocker = mocker.patch.object(
+        pymongo, "MongoClient", return_value=mongomock.MongoClient()
+    )
+    resource_mocker = mocker.patch("src.connections.boto3.resource")
+    event = {"asset_id": 123456789, "task": "delete_bg_collection"}
+    for _ in range(3):
+        BGApp(Api(), event).run()
+        Api().post_data(data=[{"timestamp": 1, "data": {"bg": 0}}])
+    mongo_client_mocker.assert_called_once()
+    resource_mocker.assert_called_once()
+
+
+def test_set_stand_in_clients():
+    client = mongomock.MongoClient()
+    s3 = object()
+    connections.set_mongo_client(client)
+    connections.set_s3_resource(s3)
+    assert connections.get_mongo_client() is client
+    assert connections.get_s3_resource() is s3
@@ -0,0 +1,182 @@
+import json
+import random
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.osu_api import Api
+from src.p01_2_make_dummy_data import (ACTIVITIES, BatchInserter,
+                                       GenerateDummyData)
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+
+KWARGS = dict(
+    number_of_datapoints=250,
+    number_of_drillstrings=3,
+    asset_ids=[1, 2],
+    start_ts=1677112068,
+    seed=7,
+)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_records(tmp_path):
+    rows = GenerateDummyData.generate_wits_file(
+        path=tmp_path, file_name="wits.jsonl", chunk_size=100, **KWARGS
+    )
+    records = read_jsonl(tmp_path / "wits.jsonl")
+    assert rows == len(records) == 2 * 3 * 250
+
+    # same shape as the records of _generate_records
+    expected = GenerateDummyData._generate_records(number_of_datapoints=2)[0]
+    assert list(records[0]) == list(expected)
+    assert list(records[0]["data"]) == list(expected["data"])
+    assert {r["activity"] for r in records} == set(ACTIVITIES)
+    assert all(0 <= r["data"]["wob"] <= 50_000 for r in records)
+
+    # the drillstrings of an asset follow each other, their ids are unique
+    ds_ids = [(r["asset_id"], r["drill_string_id"]) for r in records[::250]]
+    assert ds_ids == [(1, "ds_1"), (1, "ds_2"), (1, "ds_3"), (2, "ds_4"), (2, "ds_5"), (2, "ds_6")]
+    asset = [r for r in records if r["asset_id"] == 1]
+    assert [r["timestamp"] for r in asset] == list(range(1677112069, 1677112069 + 750))
+    assert np.all(np.diff([r["data"]["md"] for r in asset]) > 0)
+
+
+def test_same_seed_same_data_for_any_chunk_size():
+    def rows(chunk_size, seed=7):
+        chunks = list(
+            GenerateDummyData.iter_wits_columns(**{**KWARGS, "seed": seed}, chunk_size=chunk_size)
+        )
+        return [
+            np.concatenate([chunk[name] for chunk in chunks])
+            for name in ("timestamp", "wob", "activity")
+        ]
+
+    for a, b in zip(rows(1000), rows(33)):
+        assert np.array_equal(a, b)
+    assert not np.array_equal(rows(1000)[1], rows(1000, seed=8)[1])
+
+
+def test_parquet_is_read_by_api(tmp_path):
+    pytest.importorskip("pyarrow")
+    GenerateDummyData.generate_wits_file(path=tmp_path, file_name="wits.jsonl", **KWARGS)
+    rows = GenerateDummyData.generate_wits_file(
+        path=tmp_path, file_name="wits.parquet", chunk_size=200, **KWARGS
+    )
+    assert rows == 1500
+
+    query = {
+        "sort": 1,
+        "limit": 100_000,
+        "fields": ["timestamp", "provider", "drill_string_id", "asset_id", "data", "activity"],
+    }
+    records = Api(resources_path=tmp_path).get_data(
+        provider_name="osu_provider", data_name="wits", query=query
+    )
+    expected = sorted(read_jsonl(tmp_path / "wits.jsonl"), key=lambda r: r["timestamp"])
+    assert records == expected
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown file format"):
+        GenerateDummyData.generate_wits_file(path=tmp_path, file_name="wits.csv")
+
+
+def test_combine_reproduces_the_wits_resource(tmp_path, mocker):
+    get_collection = mocker.patch("src.p01_2_make_dummy_data.get_collection")
+    count = GenerateDummyData.combine_json_files(
+        path=RESOURCES_PATH, combined_file_name=str(tmp_path / "wits.json")
+    )
+    assert count == 3000
+    with open(tmp_path / "wits.json") as f, open(RESOURCES_PATH / "wits.json") as expected:
+        assert f.read() == expected.read()
+    # no mongoDB client without insert_to_mongoDB
+    get_collection.assert_not_called()
+
+
+def test_combine_merges_on_the_timestamp(tmp_path, mocker):
+    # a small buffer cuts the records between the reads
+    mocker.patch("src.p01_2_make_dummy_data.READ_BUFFER_SIZE", 7)
+    rng = random.Random(3)
+    files = {}
+    for name in ("a.json", "b.jsonl", "c.json", "empty.json"):
+        timestamps = sorted(rng.sample(range(10_000), 0 if name == "empty.json" else 500))
+        files[name] = [{"timestamp": ts, "file": name, "data": {"x": ts / 3}} for ts in timestamps]
+        with open(tmp_path / name, "w") as f:
+            if name.endswith(".jsonl"):
+                f.writelines(json.dumps(record) + "\n" for record in files[name])
+            else:
+                json.dump(files[name], f, indent=4 if name == "a.json" else None)
+
+    for combined_file_name, indent in (("out.json", 4), ("out.json", None), ("out.jsonl", 4)):
+        count = GenerateDummyData.combine_json_files(
+            path=tmp_path,
+            file_names=list(files),
+            combined_file_name=combined_file_name,
+            indent=indent,
+        )
+        expected = sorted(
+            (record for records in files.values() for record in records),
+            key=lambda record: record["timestamp"],
+        )
+        assert count == 1500
+        if combined_file_name.endswith(".jsonl"):
+            with open(tmp_path / combined_file_name) as f:
+                assert [json.loads(line) for line in f] == expected
+        else:
+            with open(tmp_path / combined_file_name) as f:
+                assert f.read() == json.dumps(expected, indent=indent)
+
+
+def test_combine_inserts_in_batches(tmp_path, mongo_client):
+    for i in range(3):
+        with open(tmp_path / f"ds_{i}.json", "w") as f:
+            json.dump([{"timestamp": 3 * ts + i, "asset_id": 1} for ts in range(100)], f)
+
+    count = GenerateDummyData.combine_json_files(
+        path=tmp_path,
+        file_names=[f"ds_{i}.json" for i in range(3)],
+        combined_file_name="wits.json",
+        insert_to_mongoDB=True,
+        batch_size=7,
+        workers=1,
+    )
+    wits = mongo_client["Drilling"]["wits"]
+    assert count == wits.count_documents({}) == 300
+    assert sorted(r["timestamp"] for r in wits.find()) == list(range(300))
+    assert "asset_id_timestamp" in wits.index_information()
+    # the records written to the file do not get the _id of mongoDB
+    with open(tmp_path / "wits.json") as f:
+        assert all("_id" not in record for record in json.load(f))
+
+
+def test_batch_inserter_bounds_the_batches_in_flight():
+    lock = threading.Lock()
+    running = []
+    in_flight = []
+    release = threading.Semaphore(0)
+
+    class Collection:
+        def insert_many(self, batch, ordered=True):
+            with lock:
+                running.append(batch)
+                in_flight.append(len(running))
+            release.acquire(timeout=5)
+            with lock:
+                running.remove(batch)
+            return SimpleNamespace(inserted_ids=[None] * len(batch))
+
+    inserter = BatchInserter(Collection(), batch_size=10, workers=3)
+    for i in range(95):
+        release.release()
+        inserter.add({"timestamp": i})
+    inserter.close()
+    assert inserter.inserted == 95
+    assert max(in_flight) <= 3
@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.model import EmptyCacheInS3
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+START_TS = 1677112070
+ASSET_ID = 123456789
+
+
+def get_data(*args, **kwargs):
+    # the wits window without the limit of the api
+    with open(RESOURCES_PATH / f"{kwargs['data_name']}.json") as f:
+        records = json.load(f)
+    query = kwargs["query"]
+    if "ts_min" in query:
+        records = [
+            record
+            for record in records
+            if query["ts_min"] <= record["timestamp"] < query["ts_max"]
+        ]
+    return records
+
+
+def iter_pages(*args, **kwargs):
+    yield get_data(*args, **kwargs)
+
+
+@pytest.fixture
+def app(mocker):
+    mocker.patch("src.p03_1_app.Api.get_data", side_effect=get_data)
+    mocker.patch("src.p03_1_app.Api.iter_pages", side_effect=iter_pages)
+    mocker.patch("src.p03_1_app.BGApp.get_cache", side_effect=EmptyCacheInS3())
+    mocker.patch(
+        "src.p03_1_app.BGApp.load_settings",
+        return_value={"data": {"bit_wear_constant": 30_000_000_000_000}},
+    )
+    posted = []
+    mocker.patch("src.p03_1_app.BGApp.post_bg", side_effect=posted.extend)
+    return posted
+
+
+def event(task, start_ts, end_ts):
+    return {"start_ts": start_ts, "end_ts": end_ts, "asset_id": ASSET_ID, "task": task}
+
+
+def test_incremental_matches_windowed_runs(app, tmp_path):
+    # windows of 60 seconds over the change of drillstring at 1677113068
+    ends = range(START_TS + 60, START_TS + 1500, 60)
+
+    store = LocalFileStateStore(tmp_path / "windowed")
+    start_ts = START_TS
+    for end_ts in ends:
+        BGApp(Api(), event("calculate_bg", start_ts, end_ts), state_store=store).run()
+        start_ts = end_ts
+    windowed = list(app)
+    app.clear()
+
+    # the realtime trigger always sends the same start, only new rows are graded
+    store = LocalFileStateStore(tmp_path / "incremental")
+    for end_ts in ends:
+        BGApp(
+            Api(),
+            event("calculate_bg_incremental", START_TS, end_ts),
+            state_store=store,
+        ).run()
+
+    assert app == windowed
+    assert len({record["timestamp"] for record in app}) == len(app)
+
+
+def test_incremental_fetches_only_new_rows(app, tmp_path, mocker):
+    store = LocalFileStateStore(tmp_path)
+    bg_app = BGApp(
+        Api(), event("calculate_bg_incremental", START_TS, START_TS + 60), store
+    )
+    bg_app.run()
+    high_water_mark = app[-1]["timestamp"]
+
+    bg_app = BGApp(
+        Api(), event("calculate_bg_incremental", START_TS, START_TS + 120), store
+    )
+    fetch_wits_records = mocker.spy(bg_app, "fetch_wits_records")
+    bg_app.run()
+    fetch_wits_records.assert_called_once_with(start_ts=high_water_mark + 1)
+    assert all(record["timestamp"] > high_water_mark for record in app[-3:])
+
+
+def test_incremental_nothing_new(app, tmp_path):
+    store = LocalFileStateStore(tmp_path)
+    BGApp(Api(), event("calculate_bg_incremental", START_TS, START_TS + 60), store).run()
+    count = len(app)
+    bg_list = BGApp(
+        Api(), event("calculate_bg_incremental", START_TS, app[-1]["timestamp"]), store
+    ).calculate_BG_incremental(_return=True)
+    assert bg_list == []
+    assert len(app) == count
@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from src import instrumentation
+from src.instrumentation import PROMETHEUS_REGISTRY, RunMetrics, TimedIterator
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import LocalFileStateStore
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+START_TS = 1677112070
+ASSET_ID = 123456789
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    PROMETHEUS_REGISTRY.clear()
+    yield
+    PROMETHEUS_REGISTRY.clear()
+
+
+@pytest.fixture
+def mongo_client(mongo_client, s3, mocker):
+    mydb = mongo_client["Drilling"]
+    for collection_name, file_name in [
+        ("wits", "wits.json"),
+        ("drillstring", "ds_data.json"),
+        ("downhole_motor", "dhm_data.json"),
+    ]:
+        with open(RESOURCES_PATH / file_name) as f:
+            mydb[collection_name].insert_many(json.load(f))
+    mocker.patch(
+        "src.p03_1_app.BGApp.fetch_setting",
+        return_value=("etag", {"data": {"bit_wear_constant": 30_000_000_000_000}}),
+    )
+    return mongo_client
+
+
+def run_calculate_bg(tmp_path, end_ts):
+    event = {"start_ts": START_TS, "end_ts": end_ts, "asset_id": ASSET_ID, "task": "calculate_bg"}
+    BGApp(Api(), event, state_store=LocalFileStateStore(tmp_path)).run()
+
+
+def metric_lines(caplog):
+    lines = [
+        json.loads(record.getMessage())
+        for record in caplog.records
+        if record.getMessage().startswith('{"message": "bg_app_metrics"')
+    ]
+    return lines
+
+
+def test_calculate_bg_stages(mongo_client, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    run_calculate_bg(tmp_path, START_TS + 300)
+
+    [metrics] = metric_lines(caplog)
+    assert metrics["task"] == "calculate_bg"
+    assert metrics["status"] == "ok"
+    stages = metrics["stages"]
+    for stage in (
+        "run",
+        "wits_fetch",
+        "wits_parse",
+        "ds_fetch",
+        "dhm_fetch",
+        "settings",
+        "state_read",
+        "grade",
+        "post",
+    ):
+        assert stages[stage]["calls"] >= 1, stage
+
+    graded = mongo_client["Drilling"]["BG"].count_documents({})
+    assert stages["wits_fetch"]["rows"] == 300
+    assert stages["wits_parse"]["rows"] == graded
+    assert stages["grade"]["rows"] == graded
+    assert stages["post"]["rows"] == graded
+    # wits page, drillstrings, motors and one bulk write per drillstring
+    drillstrings = len(mongo_client["Drilling"]["BG"].distinct("drillstring_id"))
+    assert metrics["external_calls"]["mongo"] == 3 + drillstrings
+    # per drillstring the legacy cache read (no state yet) and the cache pointer
+    assert metrics["external_calls"]["s3"] == 2 * drillstrings
+
+
+def test_failed_run_is_reported(mongo_client, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    event = {"start_ts": START_TS, "end_ts": START_TS, "asset_id": ASSET_ID, "task": "calculate_bg"}
+    with pytest.raises(ValueError):
+        BGApp(Api(), event, state_store=LocalFileStateStore(tmp_path)).run()
+    [metrics] = metric_lines(caplog)
+    assert metrics["status"] == "failed"
+    assert 'bgapp_runs_total{status="failed",task="calculate_bg"} 1' in PROMETHEUS_REGISTRY.render()
+
+
+def test_emf_document(mongo_client, tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("BG_METRICS_EMF", "1")
+    run_calculate_bg(tmp_path, START_TS + 60)
+
+    document = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    [definition] = document["_aws"]["CloudWatchMetrics"]
+    assert definition["Namespace"] == "BGApp"
+    assert definition["Dimensions"] == [["task"]]
+    names = {metric["Name"] for metric in definition["Metrics"]}
+    assert {"grade_seconds", "post_rows", "mongo_calls"} <= names
+    assert all(name in document for name in names)
+    assert document["task"] == "calculate_bg"
+
+
+def test_emf_is_off_outside_lambda(monkeypatch):
+    monkeypatch.delenv("BG_METRICS_EMF", raising=False)
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    assert not instrumentation.emf_enabled()
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "bg_app")
+    assert instrumentation.emf_enabled()
+
+
+def test_metrics_endpoint(mongo_client, tmp_path, monkeypatch):
+    client = TestClient(app)
+    monkeypatch.delenv("BG_PROMETHEUS_METRICS", raising=False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setenv("BG_PROMETHEUS_METRICS", "1")
+    run_calculate_bg(tmp_path, START_TS + 60)
+    run_calculate_bg(tmp_path, START_TS + 60)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert "# TYPE bgapp_runs_total counter" in lines
+    assert 'bgapp_runs_total{status="ok",task="calculate_bg"} 2' in lines
+    assert any(
+        line.startswith('bgapp_stage_rows_total{stage="grade",task="calculate_bg"}')
+        for line in lines
+    )
+
+
+def test_metrics_follow_submitted_work():
+    metrics = RunMetrics("calculate_bg")
+    with instrumentation.activate(metrics), ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            instrumentation.submit(executor, instrumentation.count_call, "mongo")
+            for _ in range(20)
+        ]
+        # a plain submit does not carry the run
+        executor.submit(instrumentation.count_call, "s3").result()
+        for future in futures:
+            future.result()
+    assert metrics.external_calls == {"mongo": 20}
+    # outside of a run nothing is recorded
+    instrumentation.count_call("mongo")
+    assert metrics.external_calls == {"mongo": 20}
+
+
+def test_timed_iterator():
+    event = threading.Event()
+
+    def items():
+        yield 1
+        event.wait(0.05)
+        yield 2
+
+    timed = TimedIterator(items())
+    assert list(timed) == [1, 2]
+    assert timed.count == 2
+    assert timed.seconds >= 0.05
@@ -0,0 +1,144 @@
+import json
+import random
+from pathlib import Path
+
+import mongomock
+import pytest
+
+from src.osu_api import Api
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+WITS_FIELDS = ["timestamp", "provider", "drill_string_id", "data", "activity"]
+KWARGS = dict(provider_name="osu_provider", data_name="wits")
+
+
+def flatten(chunks, chunk_size):
+    records = []
+    for chunk in chunks:
+        assert 0 < len(chunk) <= chunk_size
+        records.extend(chunk)
+    return records
+
+
+@pytest.mark.parametrize("local_index", [True, False])
+@pytest.mark.parametrize("sort", [1, -1])
+@pytest.mark.parametrize("page_size", [1, 7, 1_000])
+def test_iter_pages_matches_get_data_local(local_index, sort, page_size):
+    api = Api(resources_path=RESOURCES_PATH, local_index=local_index)
+    query = {
+        "sort": sort,
+        "fields": WITS_FIELDS,
+        "ts_min": 1677112070,
+        "ts_max": 1677113070,
+    }
+    pages = api.iter_pages(query=query, page_size=page_size, **KWARGS)
+    records = flatten(pages, page_size)
+    assert records == api.get_data(query={**query, "limit": 10_000}, **KWARGS)
+    assert len(records) == 1_000
+
+
+def test_iter_pages_matches_get_data_with_ties(tmp_path):
+    rng = random.Random(12)
+    records = [
+        {"timestamp": rng.randint(0, 30), "drill_string_id": f"ds_{i}"} for i in range(300)
+    ]
+    with open(tmp_path / "wits.json", "w") as f:
+        json.dump(records, f)
+    api = Api(resources_path=tmp_path)
+    for _ in range(50):
+        ts_min = rng.randint(1, 30)
+        query = {
+            "sort": rng.choice([1, -1]),
+            "fields": ["timestamp", "drill_string_id"],
+            "ts_min": ts_min,
+            "ts_max": ts_min + rng.randint(1, 30),
+        }
+        page_size = rng.randint(1, 50)
+        pages = api.iter_pages(query=query, page_size=page_size, prefetch=False, **KWARGS)
+        expected = api.get_data(query={**query, "limit": 1_000}, **KWARGS)
+        assert flatten(pages, page_size) == expected
+
+
+def test_iter_pages_is_lazy(mocker):
+    api = Api(resources_path=RESOURCES_PATH)
+    read = mocker.spy(api, "get_data")
+    query = {"sort": 1, "fields": WITS_FIELDS, "ts_min": 1677112070, "ts_max": 1677112080}
+    pages = api.iter_pages(query=query, page_size=4, prefetch=False, **KWARGS)
+    assert [len(page) for page in pages] == [4, 4, 2]
+    read.assert_not_called()
+
+
+def test_iter_pages_equal_timestamps_raise():
+    api = Api(resources_path=RESOURCES_PATH)
+    query = {"sort": 1, "fields": WITS_FIELDS, "ts_min": 1, "ts_max": 1}
+    with pytest.raises(ValueError, match="ts_min and ts_max are equal."):
+        list(api.iter_pages(query=query, **KWARGS))
+
+
+def full_window(records, ts_min, ts_max, fields):
+    window = [record for record in records if ts_min <= record["timestamp"] < ts_max]
+    window = sorted(window, key=lambda x: x["timestamp"])
+    return [{k: v for k, v in record.items() if k in fields} for record in window]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+@pytest.mark.parametrize("page_size", [1, 3, 50, 10_000])
+def test_iter_pages_from_mongo_with_ties(page_size, prefetch, mongo_client):
+    rng = random.Random(page_size)
+    records = [
+        {"timestamp": rng.randint(0, 40), "drill_string_id": f"ds_{i}", "asset_id": 1}
+        for i in range(120)
+    ]
+    mongo_client["Drilling"]["wits"].insert_many([dict(record) for record in records])
+
+    query = {
+        "sort": 1,
+        "fields": ["timestamp", "drill_string_id"],
+        "ts_min": 5,
+        "ts_max": 35,
+        "read_from_mongo": "True",
+    }
+    pages = Api().iter_pages(
+        query=query, page_size=page_size, prefetch=prefetch, asset_id=1, **KWARGS
+    )
+    paged = flatten(pages, page_size)
+    expected = full_window(records, 5, 35, query["fields"])
+    # the order of equal timestamps is up to the database
+    assert sorted(paged, key=lambda x: (x["timestamp"], x["drill_string_id"])) == sorted(
+        expected, key=lambda x: (x["timestamp"], x["drill_string_id"])
+    )
+    assert [r["timestamp"] for r in paged] == [r["timestamp"] for r in expected]
+
+
+def test_iter_pages_queries_one_page_at_a_time(mongo_client, mocker):
+    mongo_client["Drilling"]["wits"].insert_many(
+        [{"timestamp": ts, "asset_id": 1} for ts in range(10)]
+    )
+    find = mocker.spy(mongomock.collection.Collection, "find")
+
+    query = {"sort": -1, "fields": ["timestamp"], "read_from_mongo": "True"}
+    pages = list(Api().iter_pages(query=query, page_size=4, asset_id=1, **KWARGS))
+
+    assert pages == [
+        [{"timestamp": ts} for ts in range(9, 5, -1)],
+        [{"timestamp": ts} for ts in range(5, 1, -1)],
+        [{"timestamp": 1}, {"timestamp": 0}],
+    ]
+    assert [call.kwargs["limit"] for call in find.call_args_list] == [4, 4, 4]
+
+
+@pytest.mark.parametrize("local_index", [True, False])
+def test_iter_pages_local_covers_the_window(local_index):
+    api = Api(resources_path=RESOURCES_PATH, local_index=local_index)
+    with open(RESOURCES_PATH / "wits.json") as f:
+        records = json.load(f)
+    query = {"sort": 1, "fields": WITS_FIELDS, "ts_min": 1677112070, "ts_max": 1677113070}
+    pages = api.iter_pages(query=query, page_size=128, **KWARGS)
+    assert flatten(pages, 128) == full_window(records, 1677112070, 1677113070, WITS_FIELDS)
+
+
+def test_iter_pages_raises_from_the_page_reader():
+    api = Api(resources_path=RESOURCES_PATH)
+    query = {"sort": 1, "fields": ["not_a_field"]}
+    with pytest.raises(ValueError, match="Not all fields are present"):
+        list(api.iter_pages(query=query, **KWARGS))
@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.load_test import (TASKS, load_test, make_events, parse_mix,
+                                  summarize)
+
+
+def test_parse_mix():
+    assert parse_mix(["calculate_bg=1", "return_cache=2.5", "get_app_setting"]) == {
+        "calculate_bg": 1.0,
+        "return_cache": 2.5,
+        "get_app_setting": 1.0,
+    }
+    with pytest.raises(ValueError, match="Unknown task"):
+        parse_mix(["delete_cache=1"])
+
+
+def test_make_events():
+    events = make_events({"calculate_bg": 1, "return_cache": 3}, 400, window=120, seed=3)
+    assert events == make_events({"calculate_bg": 1, "return_cache": 3}, 400, window=120, seed=3)
+    tasks = [event["task"] for event in events]
+    assert set(tasks) == {"calculate_bg", "return_cache"}
+    assert 50 < tasks.count("calculate_bg") < 150
+    assert all(event["end_ts"] - event["start_ts"] == 120 for event in events)
+
+
+def test_summarize():
+    runs = [
+        {"task": "return_cache", "status": 200, "error": False, "latency": i / 100}
+        for i in range(1, 101)
+    ]
+    runs.append({"task": "calculate_bg", "status": 500, "error": True, "latency": 2.0})
+    summary = summarize(runs, seconds=2.0)
+    assert summary["requests"] == 101
+    assert summary["errors"] == 1
+    assert summary["throughput"] == 50.5
+    assert set(summary["latency"]) == {"p50", "p95", "p99", "max"}
+    assert summary["tasks"]["calculate_bg"]["error_rate"] == 1.0
+    return_cache = summary["tasks"]["return_cache"]
+    assert return_cache["error_rate"] == 0.0
+    assert return_cache["latency"]["p50"] == pytest.approx(0.505)
+    assert return_cache["latency"]["max"] == 1.0
+
+
+@pytest.mark.parametrize("flavor", ["fastapi", "flask"])
+def test_load_test(flavor):
+    events = make_events({task: 1 for task in TASKS}, 30)
+    # one worker, the calculate_bg windows overlap and are not upserted at the same time
+    result = load_test(flavor, workers=1, events=events, concurrency=4)
+    assert result["flavor"] == flavor
+    assert result["workers"] == 1
+    assert result["requests"] == 30
+    assert result["error_rate"] == 0.0
+    assert result["throughput"] > 0
+    assert set(result["tasks"]) == set(TASKS)
@@ -0,0 +1,107 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from src.local_store import INDEX_FOLDER, open_index
+from src.osu_api import Api
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+FIELDS = ["timestamp", "provider", "drill_string_id", "data", "activity"]
+
+
+def write_wits(path, records):
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / "wits.json", "w") as f:
+        json.dump(records, f)
+
+
+def get_both(path, query):
+    kwargs = dict(provider_name="osu_provider", data_name="wits", query=query)
+    indexed = Api(resources_path=path).get_data(**kwargs)
+    plain = Api(resources_path=path, local_index=False).get_data(**kwargs)
+    return indexed, plain
+
+
+@pytest.mark.parametrize("sort", [1, -1])
+@pytest.mark.parametrize("limit", [1, 10, 100_000])
+def test_indexed_wits_matches_json_load(sort, limit):
+    query = {
+        "sort": sort,
+        "limit": limit,
+        "fields": FIELDS,
+        "ts_min": 1677112070,
+        "ts_max": 1677112070 + 600,
+    }
+    indexed, plain = get_both(RESOURCES_PATH, query)
+    assert indexed == plain
+    assert len(indexed) > 0
+
+
+def test_indexed_matches_json_load_with_ties(tmp_path):
+    rng = random.Random(11)
+    for seed in range(30):
+        records = [
+            {
+                "timestamp": rng.randint(0, 20),
+                "drill_string_id": f"ds_{i}",
+                "activity": "rotary_drilling",
+                "data": {"wob": i},
+            }
+            for i in range(rng.randint(0, 60))
+        ]
+        path = tmp_path / str(seed)
+        write_wits(path, records)
+        for _ in range(10):
+            ts_min = rng.randint(1, 20)
+            query = {
+                "sort": rng.choice([1, -1]),
+                "limit": rng.randint(1, 70),
+                "fields": ["timestamp", "drill_string_id"],
+            }
+            if rng.random() < 0.7:
+                query.update(ts_min=ts_min, ts_max=ts_min + rng.randint(1, 10))
+            indexed, plain = get_both(path, query)
+            assert indexed == plain
+
+
+def test_missing_field_outside_the_window_still_raises(tmp_path):
+    records = [
+        {"timestamp": 1, "provider": "p"},
+        {"timestamp": 2, "provider": "p", "activity": "rotary_drilling"},
+    ]
+    write_wits(tmp_path, records)
+    query = {"sort": 1, "fields": ["timestamp", "activity"], "ts_min": 2, "ts_max": 3}
+    for local_index in (True, False):
+        with pytest.raises(ValueError, match="Not all fields are present"):
+            Api(resources_path=tmp_path, local_index=local_index).get_data(
+                provider_name="p", data_name="wits", query=query
+            )
+
+
+def test_index_is_rebuilt_when_source_changes(tmp_path):
+    write_wits(tmp_path, [{"timestamp": 1}])
+    assert len(open_index(tmp_path / "wits.json")) == 1
+    assert (tmp_path / INDEX_FOLDER / "wits.meta.json").exists()
+
+    write_wits(tmp_path, [{"timestamp": 1}, {"timestamp": 2}, {"timestamp": 0}])
+    index = open_index(tmp_path / "wits.json")
+    assert len(index) == 3
+    assert [r["timestamp"] for r in index.read(*index.window(1, 3))] == [1, 2]
+
+
+def test_records_without_timestamp_are_not_indexed(tmp_path):
+    write_wits(tmp_path, [{"timestamp": 1}, {"provider": "p"}])
+    assert open_index(tmp_path / "wits.json") is None
+
+
+def test_local_only_ignores_read_from_mongo(mocker):
+    get_collection = mocker.patch("src.osu_api.get_collection")
+    query = {"sort": 1, "limit": 5, "fields": FIELDS, "read_from_mongo": "True"}
+    api = Api(resources_path=RESOURCES_PATH, local_only=True)
+    records = api.get_data(provider_name="osu_provider", data_name="wits", query=query)
+    pages = api.iter_pages(provider_name="osu_provider", data_name="wits", query=query)
+    assert len(records) == 5
+    assert sum(len(page) for page in pages) == 3000
+    get_collection.assert_not_called()
@@ -0,0 +1,138 @@
+import json
+from pathlib import Path
+
+import mongomock
+import pymongo
+import pytest
+
+from src.mongo_query import build_mongo_query, ensure_indexes
+from src.osu_api import Api
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+
+
+@pytest.fixture
+def mongo_client(mongo_client):
+    mydb = mongo_client["Drilling"]
+    for collection_name, file_name in [
+        ("wits", "wits.json"),
+        ("drillstring", "ds_data.json"),
+        ("downhole_motor", "dhm_data.json"),
+    ]:
+        with open(RESOURCES_PATH / file_name) as f:
+            mydb[collection_name].insert_many(json.load(f))
+    return mongo_client
+
+
+@pytest.fixture
+def api():
+    return Api(resources_path=RESOURCES_PATH)
+
+
+WITS_FIELDS = ["timestamp", "provider", "drill_string_id", "data", "activity"]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"sort": 1, "fields": WITS_FIELDS, "ts_min": 1677112070, "ts_max": 1677112130},
+        {"sort": -1, "fields": WITS_FIELDS, "ts_min": 1677112070, "ts_max": 1677112130},
+        {"sort": 1, "limit": 100, "fields": WITS_FIELDS, "ts_min": 1677113000, "ts_max": 1677114100},
+        {"limit": 25, "fields": ["timestamp", "data"]},
+        {"sort": 1, "limit": 3, "fields": ["timestamp"], "ts_min": 1677115060, "ts_max": 1677115100},
+        {"sort": 1, "fields": WITS_FIELDS, "ts_min": 1677119000, "ts_max": 1677119060},
+    ],
+)
+def test_wits_mongo_matches_python_path(api, mongo_client, query):
+    mongo_records = api.get_data(
+        provider_name="osu_provider",
+        data_name="wits",
+        query={**query, "read_from_mongo": "True"},
+        asset_id=123456789,
+    )
+    local_records = api.get_data(
+        provider_name="osu_provider",
+        data_name="wits",
+        query=query,
+        asset_id=123456789,
+    )
+    assert mongo_records == local_records
+
+
+@pytest.mark.parametrize(
+    "data_name, fields",
+    [
+        ("ds_data", ["_drill_string_id", "down_hole_motor_id"]),
+        ("dhm_data", ["motor_id", "motor_cof"]),
+    ],
+)
+def test_metadata_mongo_matches_python_path(api, mongo_client, data_name, fields):
+    query = {"fields": fields}
+    mongo_records = api.get_data(
+        provider_name="osu_provider",
+        data_name=data_name,
+        query={**query, "read_from_mongo": "True"},
+        asset_id=123456789,
+    )
+    local_records = api.get_data(
+        provider_name="osu_provider", data_name=data_name, query=query
+    )
+    assert mongo_records == local_records
+
+
+def test_filter_by_asset_and_drill_string(api, mongo_client):
+    mongo_client["Drilling"]["wits"].insert_one(
+        {"timestamp": 1677112080, "asset_id": 1, "drill_string_id": "ds_1", "data": {}}
+    )
+    query = {
+        "sort": 1,
+        "limit": 1000,
+        "fields": ["timestamp", "drill_string_id"],
+        "drill_string_id": "ds_2",
+        "read_from_mongo": "True",
+    }
+    records = api.get_data(
+        provider_name="osu_provider", data_name="wits", query=query, asset_id=1
+    )
+    assert records == []
+
+    query["drill_string_id"] = "ds_1"
+    records = api.get_data(
+        provider_name="osu_provider", data_name="wits", query=query, asset_id=1
+    )
+    assert records == [{"timestamp": 1677112080, "drill_string_id": "ds_1"}]
+
+
+def test_build_mongo_query():
+    mongo_query = build_mongo_query(
+        {"sort": 1, "limit": 5, "fields": ["timestamp", "data"], "ts_min": 1, "ts_max": 9},
+        "wits",
+        asset_id=123456789,
+    )
+    assert mongo_query.filter == {
+        "asset_id": 123456789,
+        "timestamp": {"$gte": 1, "$lt": 9},
+    }
+    assert mongo_query.projection == {"timestamp": 1, "data": 1, "_id": 0}
+    assert mongo_query.sort == [("timestamp", pymongo.ASCENDING)]
+    assert mongo_query.limit == 5
+
+    # drillstring records have neither asset_id nor timestamp
+    mongo_query = build_mongo_query({"fields": ["motor_id"]}, "ds_data", asset_id=1)
+    assert mongo_query.filter == {}
+    assert mongo_query.sort is None
+    assert mongo_query.limit == 10
+
+
+def test_build_mongo_query_ts_min_max_eq():
+    with pytest.raises(ValueError) as e:
+        build_mongo_query({"ts_min": 1, "ts_max": 1}, "wits")
+    assert str(e.value) == "ts_min and ts_max are equal."
+
+
+def test_ensure_indexes():
+    collection = mongomock.MongoClient()["Drilling"]["wits"]
+    ensure_indexes(collection)
+    ensure_indexes(collection)
+    index = collection.index_information()["asset_id_timestamp"]
+    assert index["key"] == [("asset_id", 1), ("timestamp", 1)]
@@ -0,0 +1,109 @@
+from unittest.mock import Mock
+
+import pytest
+
+from src.model import SETTINGS, DownholeMotor, DrillString
+from src.motor_resolver import MOTOR_COF_RESOLVER, MotorCofResolver
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+
+DS_RECORDS = [
+    DrillString(drill_string_id="ds_1", down_hole_motor_id="motor_id_1"),
+    DrillString(drill_string_id="ds_2", down_hole_motor_id="motor_id_2"),
+    DrillString(drill_string_id="ds_3", down_hole_motor_id="motor_id_unknown"),
+]
+DHM_RECORDS = [
+    DownholeMotor(motor_id="motor_id_2", motor_cof=423.8),
+    DownholeMotor(motor_id="motor_id_1", motor_cof=442.9),
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def reference_join(ds_records, dhm_records):
+    return {
+        ds.drill_string_id: dhm.motor_cof
+        for ds in ds_records
+        for dhm in dhm_records
+        if ds.down_hole_motor_id == dhm.motor_id
+    }
+
+
+def test_join_matches_nested_loop():
+    assert MotorCofResolver.join(DS_RECORDS, DHM_RECORDS) == reference_join(
+        DS_RECORDS, DHM_RECORDS
+    )
+    assert MotorCofResolver.join(DS_RECORDS, DHM_RECORDS) == {
+        "ds_1": 442.9,
+        "ds_2": 423.8,
+    }
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def fetchers():
+    return Mock(return_value=DS_RECORDS), Mock(return_value=DHM_RECORDS)
+
+
+def test_map_is_cached_per_asset(clock, fetchers):
+    resolver = MotorCofResolver(ttl=60, clock=clock)
+    get_ds_data, get_downhole_motor_data = fetchers
+    for _ in range(3):
+        resolver.get(1, get_ds_data, get_downhole_motor_data)
+    assert get_ds_data.call_count == 1
+
+    resolver.get(2, get_ds_data, get_downhole_motor_data)
+    assert get_ds_data.call_count == 2
+
+    clock.now = 61
+    resolver.get(1, get_ds_data, get_downhole_motor_data)
+    assert get_ds_data.call_count == 3
+    assert get_downhole_motor_data.call_count == 3
+
+
+def test_unknown_drillstring_refreshes_map(fetchers):
+    resolver = MotorCofResolver(ttl=60)
+    get_ds_data, get_downhole_motor_data = fetchers
+    resolver.get(1, get_ds_data, get_downhole_motor_data, drill_string_ids=["ds_1"])
+    resolver.get(1, get_ds_data, get_downhole_motor_data, drill_string_ids=["ds_4"])
+    assert get_ds_data.call_count == 2
+
+
+def test_invalidate_bha_cache_task(fetchers):
+    get_ds_data, get_downhole_motor_data = fetchers
+    MOTOR_COF_RESOLVER.get(123456789, get_ds_data, get_downhole_motor_data)
+
+    event = {"asset_id": 123456789, "task": "invalidate_bha_cache"}
+    BGApp(Api(), event).run()
+
+    MOTOR_COF_RESOLVER.get(123456789, get_ds_data, get_downhole_motor_data)
+    assert get_ds_data.call_count == 2
+
+
+def test_invalidate_bha_cache_missing_item():
+    with pytest.raises(ValueError):
+        BGApp(Api(), {"task": "invalidate_bha_cache"}).run()
+
+
+def test_all_the_drillstrings_are_resolved(mongo_client, mocker):
+    mocker.patch.object(SETTINGS, "PAGE_SIZE", 7)
+    mongo_client["Drilling"]["drillstring"].insert_many(
+        [{"_drill_string_id": f"ds_{i}", "down_hole_motor_id": f"motor_{i}"} for i in range(25)]
+    )
+    mongo_client["Drilling"]["downhole_motor"].insert_many(
+        [{"motor_id": f"motor_{i}", "motor_cof": float(i)} for i in range(25)]
+    )
+    bg_app = BGApp(Api(), {"asset_id": 1})
+    # more than the default limit of get_data, over several pages
+    ds_dhm_cof_map = MOTOR_COF_RESOLVER.get(1, bg_app.get_ds_data, bg_app.get_downhole_motor_data)
+    assert ds_dhm_cof_map == {f"ds_{i}": float(i) for i in range(25)}
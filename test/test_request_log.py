@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app_flask
+import lambda_function
+from app.main import app
+from benchmarks.replay_requests import replay, stand_ins
+from src.request_log import RequestLog, close_request_logs, read_request_log
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+START_TS = 1677112070
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    path = tmp_path / "logs" / "requests.jsonl"
+    monkeypatch.setenv("BG_REQUEST_LOG", str(path))
+    yield path
+    close_request_logs()
+
+
+@pytest.fixture
+def bg_run(mocker):
+    return mocker.patch("src.p03_1_app.BGApp.run", return_value={"data": {"x": 1}})
+
+
+def test_off_by_default(tmp_path, monkeypatch, bg_run):
+    monkeypatch.delenv("BG_REQUEST_LOG", raising=False)
+    monkeypatch.chdir(tmp_path)
+    lambda_function.lambda_handler({"body": json.dumps({"asset_id": 1, "task": "get_app_setting"})})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_entry_points_append_to_the_log(log_path, bg_run):
+    event = {"start_ts": START_TS, "end_ts": START_TS + 60, "asset_id": 1, "task": "calculate_bg"}
+    lambda_function.lambda_handler({"body": json.dumps(event)})
+    with TestClient(app) as client:
+        assert client.post("/task", json=event).status_code == 200
+    assert app_flask.app.test_client().post("/task", json=event).status_code == 200
+
+    entries = read_request_log(log_path)
+    assert [entry["source"] for entry in entries] == ["lambda", "fastapi", "flask"]
+    for entry in entries:
+        assert entry["event"] == event
+        assert entry["status"] == "ok"
+        assert entry["seconds"] >= 0
+        assert entry["result_bytes"] == len(json.dumps({"data": {"x": 1}}))
+
+
+def test_failed_request_is_logged(log_path, bg_run):
+    bg_run.side_effect = ValueError("Missing items in the event")
+    with pytest.raises(ValueError):
+        lambda_function.lambda_handler({"body": json.dumps({"task": "calculate_bg"})})
+    [entry] = read_request_log(log_path)
+    assert entry["status"] == "failed"
+    assert "Missing items" in entry["error"]
+    assert entry["result_bytes"] == 0
+
+
+def test_log_is_rotated(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    log = RequestLog(path, max_bytes=500, backups=2)
+    for i in range(40):
+        log.append({"ts": i, "event": {"task": "calculate_bg", "asset_id": i}})
+    log.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "requests.jsonl",
+        "requests.jsonl.1",
+        "requests.jsonl.2",
+    ]
+    timestamps = [entry["ts"] for entry in read_request_log(path)]
+    # the oldest entries were dropped with the third file
+    assert timestamps == list(range(40 - len(timestamps), 40))
+
+
+def test_replay(tmp_path):
+    entries = [
+        {
+            "ts": 1000.0 + i * 0.01,
+            "event": {
+                "start_ts": START_TS + 60 * i,
+                "end_ts": START_TS + 60 * (i + 1),
+                "asset_id": 123456789,
+                "task": "calculate_bg",
+            },
+            "seconds": 0.05,
+        }
+        for i in range(10)
+    ]
+    entries.append({"ts": 1000.2, "event": {"asset_id": 1, "task": "get_app_setting"}})
+    entries.append({"ts": 1000.2, "event": {"task": "calculate_bg"}, "seconds": 0.01})
+
+    summary = replay(entries, speed=2.0, workers=4, **stand_ins(RESOURCES_PATH, tmp_path))
+    assert summary["requests"] == 12
+    assert summary["seconds"] >= 0.1
+    calculate_bg = summary["tasks"]["calculate_bg"]
+    assert calculate_bg["requests"] == 11
+    # the event without a window fails
+    assert calculate_bg["failed"] == 1
+    assert set(calculate_bg["latency"]) == {"p50", "p90", "p99", "max"}
+    assert calculate_bg["captured"]["max"] == 0.05
+    assert summary["tasks"]["get_app_setting"]["failed"] == 0
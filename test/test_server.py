@@ -1,52 +1,55 @@
 import json
+from pathlib import Path
 
 import pytest
 import requests
 
+from benchmarks.load_test import ASSET_ID, BIT_WEAR_CONSTANT, start_server
 
-@pytest.fixture
-def url():
-    url = "http://127.0.0.1:8080"
-    return url
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
 
 
-# skip this test for now
-@pytest.mark.skip
-def test_server_get(url):
-    # url = "http://127.0.0.1:8080"
-    response = requests.get(url)
-    print("\n", response.json())
-    assert response.status_code == 200
-    assert response.json() == {"health_check": "OK"}
+@pytest.fixture(scope="module", params=["fastapi", "flask"])
+def url(request):
+    # a local server of each flavor, wired to mongomock and moto
+    with start_server(request.param, workers=4) as url:
+        yield url
 
 
-@pytest.mark.skip
-def test_server_task_return_cache(url):
+def post_task(url, task):
     event_dict = {
         "start_ts": 1677112070,
         "end_ts": 1677112070 + 60,
-        "asset_id": 123456789,
-        "task": "return_cache",
+        "asset_id": ASSET_ID,
+        "task": task,
     }
-    event_str = json.dumps(event_dict)
-    # print(event_str)
-    url = f"http://127.0.0.1:8080/task/{event_str}"
-    response = requests.get(url)
+    return requests.post(f"{url}/task", json=event_dict, timeout=30)
+
+
+def test_server_get(url):
+    response = requests.get(url, timeout=30)
     assert response.status_code == 200
-    print("\n", response.json())
+    assert response.json() == {"health_check": "OK"}
+
+
+def test_server_task_return_cache(url):
+    response = post_task(url, "return_cache")
+    assert response.status_code == 200
+    with open(RESOURCES_PATH / "calculated_bg" / "cache.json") as f:
+        assert response.json() == json.load(f)
 
 
-@pytest.mark.skip
 def test_server_task_get_app_setting(url):
-    event_dict = {
-        "start_ts": 1677112070,
-        "end_ts": 1677112070 + 60,
-        "asset_id": 123456789,
-        "task": "get_app_setting",
-    }
-    event_str = json.dumps(event_dict)
-    # print(event_str)
-    url = f"http://127.0.0.1:8080/task/{event_str}"
-    response = requests.get(url)
+    response = post_task(url, "get_app_setting")
     assert response.status_code == 200
-    print("\n", response.json())
+    assert response.json()["data"] == {"bit_wear_constant": BIT_WEAR_CONSTANT}
+
+
+def test_server_task_calculate_bg(url):
+    response = post_task(url, "calculate_bg")
+    assert response.status_code == 200
+
+
+def test_server_task_invalid_payload(url):
+    response = requests.post(f"{url}/task", json={"task": ["calculate_bg"]}, timeout=30)
+    assert response.status_code in (400, 422)
@@ -0,0 +1,122 @@
+from unittest.mock import Mock
+
+import botocore.exceptions
+import pytest
+
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.settings_cache import AppSettingsCache
+
+SETTING = {"asset_id": 123456789, "data": {"bit_wear_constant": 30_000_000_000_000}}
+NEW_SETTING = {"asset_id": 123456789, "data": {"bit_wear_constant": 1_000}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return AppSettingsCache(ttl=60, clock=clock)
+
+
+def test_fresh_entry_is_served_from_memory(cache):
+    fetch = Mock(return_value=("etag-1", SETTING))
+    assert cache.get(123456789, fetch) == SETTING
+    assert cache.get(123456789, fetch) == SETTING
+    fetch.assert_called_once_with(None)
+
+
+def test_expired_entry_is_revalidated_with_etag(cache, clock):
+    fetch = Mock(return_value=("etag-1", SETTING))
+    cache.get(123456789, fetch)
+
+    clock.now = 61
+    fetch.return_value = ("etag-1", None)
+    assert cache.get(123456789, fetch) == SETTING
+    fetch.assert_called_with("etag-1")
+
+    clock.now = 122
+    fetch.return_value = ("etag-2", NEW_SETTING)
+    assert cache.get(123456789, fetch) == NEW_SETTING
+
+
+def test_entries_are_per_asset(cache):
+    fetch = Mock(side_effect=[("etag-1", SETTING), ("etag-2", NEW_SETTING)])
+    assert cache.get(1, fetch) == SETTING
+    assert cache.get(2, fetch) == NEW_SETTING
+    assert fetch.call_count == 2
+
+
+def test_invalidate(cache):
+    fetch = Mock(return_value=("etag-1", SETTING))
+    cache.get(123456789, fetch)
+    cache.invalidate(123456789)
+    cache.get(123456789, fetch)
+    assert fetch.call_count == 2
+
+
+def test_fetch_setting_not_modified(mocker):
+    boto3_resource = mocker.patch("src.connections.boto3.resource")
+    s3_object = boto3_resource.return_value.Object.return_value
+    s3_object.get.side_effect = botocore.exceptions.ClientError(
+        {"Error": {"Code": "304", "Message": "Not Modified"}}, "GetObject"
+    )
+
+    bg_app = BGApp(Api(), {"asset_id": 123456789})
+    assert bg_app.fetch_setting("etag-1") == ("etag-1", None)
+    s3_object.get.assert_called_once_with(IfNoneMatch="etag-1")
+
+
+def test_load_settings_reads_s3_once_per_ttl(mocker):
+    fetch_mocker = mocker.patch(
+        "src.p03_1_app.BGApp.fetch_setting", return_value=("etag-1", SETTING)
+    )
+    event = {"asset_id": 123456789, "task": "calculate_bg"}
+    for _ in range(3):
+        assert BGApp(Api(), event).load_settings() == SETTING
+    fetch_mocker.assert_called_once()
+
+
+def test_edit_setting_invalidates_cache(mocker):
+    mocker.patch("src.connections.boto3.resource")
+    fetch_mocker = mocker.patch(
+        "src.p03_1_app.BGApp.fetch_setting", return_value=("etag-1", SETTING)
+    )
+    event = {
+        "asset_id": 123456789,
+        "task": "edit_app_setting",
+        "new_setting": {"data": {"bit_wear_constant": 1_000}},
+    }
+    bg_app = BGApp(Api(), event)
+    bg_app.load_settings()
+    bg_app.run()
+    bg_app.load_settings()
+    assert fetch_mocker.call_count == 2
+
+
+def test_edit_setting_clears_the_cache_of_every_asset(mocker):
+    mocker.patch("src.connections.boto3.resource")
+    fetch_mocker = mocker.patch(
+        "src.p03_1_app.BGApp.fetch_setting", return_value=("etag-1", SETTING)
+    )
+    other_asset = BGApp(Api(), {"asset_id": 1, "task": "calculate_bg"})
+    other_asset.load_settings()
+    event = {
+        "asset_id": 123456789,
+        "task": "edit_app_setting",
+        "new_setting": {"data": {"bit_wear_constant": 1_000}},
+    }
+    BGApp(Api(), event).run()
+    # the setting is a single S3 object, the other asset reads it again
+    other_asset.load_settings()
+    assert fetch_mocker.call_count == 2
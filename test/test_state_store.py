@@ -0,0 +1,220 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from src import state_store
+from src.bg_engine import group_by_drillstring
+from src.connections import set_s3_resource
+from src.model import SETTINGS, BGState, BGStateConflict, EmptyCacheInS3, Wits
+from src.osu_api import Api
+from src.p03_1_app import BGApp
+from src.state_store import BGStateStore, LocalFileStateStore, S3StateStore
+
+
+@pytest.fixture
+def make_local_store(tmp_path):
+    return lambda: LocalFileStateStore(tmp_path)
+
+
+@pytest.fixture
+def make_s3_store():
+    with mock_aws():
+        s3 = boto3.resource("s3", region_name=SETTINGS.REGION_NAME)
+        s3.create_bucket(
+            Bucket=SETTINGS.CACHE_BUCKET_NAME,
+            CreateBucketConfiguration={"LocationConstraint": SETTINGS.REGION_NAME},
+        )
+        set_s3_resource(s3)
+        yield S3StateStore
+
+
+@pytest.fixture(params=["make_local_store", "make_s3_store"])
+def make_store(request):
+    return request.getfixturevalue(request.param)
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
+
+
+@pytest.fixture
+def local_store(make_local_store):
+    return make_local_store()
+
+
+def test_get_put(store):
+    assert store.get(1, "ds_1") is None
+    store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    store.put(1, [BGState(drillstring_id="ds_2", timestamp=20, bg=0.1)])
+    store.put(2, [BGState(drillstring_id="ds_1", timestamp=30, bg=0.9)])
+
+    assert store.get(1, "ds_1") == BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)
+    assert set(store.get_all(1)) == {"ds_1", "ds_2"}
+    assert store.get(2, "ds_1").bg == 0.9
+
+    store.delete(1)
+    assert store.get_all(1) == {}
+    assert store.get(2, "ds_1").bg == 0.9
+
+
+def test_reads_are_cached(local_store, mocker):
+    local_store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    read_mocker = mocker.spy(local_store, "_read")
+    for _ in range(3):
+        local_store.get(1, "ds_1")
+    read_mocker.assert_not_called()
+
+
+def test_concurrent_writers_are_merged(make_store):
+    store = make_store()
+    # a second store (another lambda container) has a stale cached version
+    other = make_store()
+    other.get_all(1)
+
+    store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    other.put(1, [BGState(drillstring_id="ds_2", timestamp=20, bg=0.1)])
+    # an older state of a drillstring does not overwrite a newer one
+    other.put(1, [BGState(drillstring_id="ds_1", timestamp=5, bg=0.2)])
+
+    assert store.refresh(1) == {
+        "ds_1": BGState(drillstring_id="ds_1", timestamp=10, bg=0.5),
+        "ds_2": BGState(drillstring_id="ds_2", timestamp=20, bg=0.1),
+    }
+
+
+def test_runs_see_the_writes_of_another_store(make_store):
+    store = make_store()
+    store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    assert store.refresh(1)["ds_1"].timestamp == 10
+
+    # another container moves the state after this one cached it
+    make_store().put(1, [BGState(drillstring_id="ds_1", timestamp=20, bg=0.7)])
+    assert store.refresh(1)["ds_1"] == BGState(drillstring_id="ds_1", timestamp=20, bg=0.7)
+    assert store.get(1, "ds_1").timestamp == 20
+
+    make_store().delete(1)
+    assert store.refresh(1) == {}
+
+
+def test_unchanged_s3_state_is_not_downloaded(make_s3_store, mocker):
+    store = make_s3_store()
+    store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    load_states = mocker.spy(state_store, "_load_states")
+    assert store.refresh(1)["ds_1"].timestamp == 10
+    load_states.assert_not_called()
+
+
+def test_bgapp_run_refreshes_the_states(local_store, make_local_store):
+    local_store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+    bg_app = BGApp(Api(), {"asset_id": 1}, state_store=local_store)
+    assert bg_app.read_states()["ds_1"].bg == 0.5
+    make_local_store().put(1, [BGState(drillstring_id="ds_1", timestamp=20, bg=0.7)])
+    assert bg_app.read_states()["ds_1"].bg == 0.7
+    assert bg_app.get_latest_bg("ds_1") == 0.7
+
+
+def test_legacy_cache_is_used_for_its_asset_only(local_store, mocker):
+    cache = {"drillstring_id": "ds_1", "asset_id": 1, "data": {"bg": 0.4}}
+    mocker.patch("src.p03_1_app.BGApp.get_cache", return_value=cache)
+    assert BGApp(Api(), {"asset_id": 1}, state_store=local_store).get_latest_bg("ds_1") == 0.4
+    assert BGApp(Api(), {"asset_id": 2}, state_store=local_store).get_latest_bg("ds_1") == 0
+    assert BGApp(Api(), {"asset_id": 1}, state_store=local_store).get_latest_bg("ds_2") == 0
+
+
+def test_legacy_cache_without_asset_id(local_store, mocker):
+    # a cache.json written before the asset_id was added to it
+    cache = {
+        "timestamp": 1677115018,
+        "provider": "osu_provider",
+        "drillstring_id": "ds_3",
+        "data": {"bg": 0.095},
+    }
+    mocker.patch("src.p03_1_app.BGApp.get_cache", return_value=cache)
+    bg_app = BGApp(Api(), {"asset_id": 1}, state_store=local_store)
+    ds = cache["drillstring_id"]
+    assert bg_app.get_latest_bg(ds, start_ts=cache["timestamp"] + 1) == cache["data"]["bg"]
+    assert bg_app.get_latest_bg("another_ds", start_ts=cache["timestamp"] + 1) == 0
+
+
+def test_conflict_after_retries(local_store, mocker):
+    mocker.patch.object(local_store, "_write", side_effect=BGStateConflict("changed"))
+    with pytest.raises(BGStateConflict):
+        local_store.put(1, [BGState(drillstring_id="ds_1", timestamp=10, bg=0.5)])
+
+
+def wits(ts, ds):
+    return Wits(
+        timestamp=ts, drill_string_id=ds, md=1, wob=30_000, rpm=200, rop=10, flowrate=400
+    )
+
+
+def test_bgapp_resumes_each_drillstring(local_store, mocker):
+    mocker.patch("src.p03_1_app.BGApp.get_cache", side_effect=EmptyCacheInS3())
+    post_mocker = mocker.patch("src.p03_1_app.BGApp.post_bg")
+    app_setting = {"data": {"bit_wear_constant": 1_000_000_000}}
+    ds_dhm_cof_map = {"ds_1": 100, "ds_2": 200}
+    bg_app = BGApp(Api(), {"asset_id": 1}, state_store=local_store)
+
+    # a window with two drillstrings, then the first drillstring again
+    bg_app.calculate_bit_grade(
+        group_by_drillstring([wits(1, "ds_1"), wits(2, "ds_1"), wits(3, "ds_2")]),
+        ds_dhm_cof_map,
+        app_setting,
+    )
+    bg_list = bg_app.calculate_bit_grade(
+        group_by_drillstring([wits(4, "ds_1")]),
+        ds_dhm_cof_map,
+        app_setting,
+        _return=True,
+    )
+
+    assert local_store.get(1, "ds_2") == BGState(drillstring_id="ds_2", timestamp=3, bg=2.406)
+    assert [record["data"]["bg"] for record in bg_list] == [3.618]
+    assert post_mocker.call_count == 3
+
+
+def test_bgapp_posts_the_records_chunk_by_chunk(local_store, mocker):
+    mocker.patch("src.p03_1_app.BGApp.get_cache", side_effect=EmptyCacheInS3())
+    mocker.patch.object(SETTINGS, "BG_GRADE_CHUNK_SIZE", 2)
+    posted = []
+    mocker.patch("src.p03_1_app.BGApp.post_bg", side_effect=posted.append)
+    app_setting = {"data": {"bit_wear_constant": 1_000_000_000}}
+    bg_app = BGApp(Api(), {"asset_id": 1}, state_store=local_store)
+
+    wits_per_ds = group_by_drillstring([wits(ts, "ds_1") for ts in range(1, 6)])
+    assert bg_app.calculate_bit_grade(wits_per_ds, {"ds_1": 100}, app_setting) is None
+    assert [[record["timestamp"] for record in chunk] for chunk in posted] == [[1, 2], [3, 4], [5]]
+    assert local_store.get(1, "ds_1").timestamp == 5
+
+    # the same records are returned with _return
+    local_store.delete(1)
+    bg_list = bg_app.calculate_bit_grade(wits_per_ds, {"ds_1": 100}, app_setting, _return=True)
+    assert bg_list == [record for chunk in posted[:3] for record in chunk]
+
+
+def test_grading_a_window_again_gives_the_same_bg(local_store, mongo_client, s3, mocker):
+    mocker.patch("src.p03_1_app.BGApp.get_cache", side_effect=EmptyCacheInS3())
+    app_setting = {"data": {"bit_wear_constant": 1_000_000_000}}
+    bg_app = BGApp(Api(), {"asset_id": 1}, state_store=local_store)
+
+    def grade(timestamps):
+        wits_per_ds = group_by_drillstring([wits(ts, "ds_1") for ts in timestamps])
+        return bg_app.calculate_bit_grade(wits_per_ds, {"ds_1": 100}, app_setting, _return=True)
+
+    bg_list = grade(range(1, 6))
+    assert grade(range(1, 6)) == bg_list
+    assert grade(range(1, 6)) == bg_list
+    # a window that overlaps the graded ones continues from the record before it
+    assert grade(range(3, 8))[:3] == bg_list[2:]
+    assert mongo_client["Drilling"]["BG"].count_documents({}) == 7
+    # grading an older window does not move the state backwards
+    state = local_store.get(1, "ds_1")
+    assert grade(range(1, 3)) == bg_list[:2]
+    assert local_store.get(1, "ds_1") == state
+    assert state.timestamp == 7
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        BGStateStore()
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, lifespan
+from src.osu_api import Api
+from src.task_runner import TaskRunner
+
+EVENT = {"start_ts": 1677112070, "end_ts": 1677112130, "asset_id": 1, "task": "calculate_bg"}
+
+
+class Runs:
+    """Stand-in BGApp.run recording the events it ran and the concurrent runs."""
+
+    def __init__(self, seconds=0.05, error=None):
+        self.seconds = seconds
+        self.error = error
+        self.events = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, bg_app):
+        with self._lock:
+            self.events.append(bg_app._event)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        if self.error:
+            raise self.error
+        return {"asset_id": bg_app._asset_id, "task": bg_app._event_task}
+
+
+@pytest.fixture
+def runs(mocker):
+    runs = Runs()
+    mocker.patch("src.p03_1_app.BGApp.run", autospec=True, side_effect=runs)
+    return runs
+
+
+def run_all(runner, events):
+    async def main():
+        return await asyncio.gather(*(runner.run(event) for event in events))
+
+    try:
+        return asyncio.run(main())
+    finally:
+        runner.close()
+
+
+def test_identical_events_run_once(runs):
+    runner = TaskRunner(Api())
+    results = run_all(runner, [dict(EVENT) for _ in range(200)])
+    assert len(runs.events) == 1
+    assert results == [{"asset_id": 1, "task": "calculate_bg"}] * 200
+    assert runner.in_flight == 0
+
+
+def test_other_windows_and_tasks_are_not_coalesced(runs):
+    events = [
+        EVENT,
+        {**EVENT, "end_ts": EVENT["end_ts"] + 60},
+        {**EVENT, "asset_id": 2},
+        {"asset_id": 1, "task": "delete_cache"},
+        {"asset_id": 1, "task": "delete_cache"},
+    ]
+    run_all(TaskRunner(Api()), events)
+    assert len(runs.events) == 5
+
+
+def test_concurrency_per_task_type(runs):
+    runner = TaskRunner(Api(), max_workers=16, concurrency={"calculate_bg": 2})
+    events = [{**EVENT, "asset_id": i} for i in range(8)]
+    events += [{"asset_id": i, "task": "return_cache"} for i in range(4)]
+    results = run_all(runner, events)
+    assert len(results) == 12
+    # two calculate_bg and the four return_cache at the same time
+    assert runs.max_running <= 6
+    assert runs.max_running > 2
+
+
+def test_error_is_raised_to_all_the_waiters(mocker):
+    runs = Runs(error=ValueError("Missing items in the event"))
+    mocker.patch("src.p03_1_app.BGApp.run", autospec=True, side_effect=runs)
+    runner = TaskRunner(Api())
+
+    async def main():
+        results = await asyncio.gather(
+            *(runner.run(dict(EVENT)) for _ in range(5)), return_exceptions=True
+        )
+        # the failed run is not kept, the next event runs again
+        with pytest.raises(ValueError):
+            await runner.run(dict(EVENT))
+        return results
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        runner.close()
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(runs.events) == 2
+
+
+def test_task_endpoint(runs):
+    with TestClient(app) as client:
+        response = client.post("/task", json={"asset_id": 7, "task": "get_app_setting"})
+    assert response.status_code == 200
+    assert response.json() == {"asset_id": 7, "task": "get_app_setting"}
+
+
+def test_batch_event_is_passed_through(runs):
+    batch = {
+        "task": "calculate_bg_batch",
+        "assets": [{"asset_id": 1}, {"asset_id": 2, "start_ts": 1677112100}],
+        "max_workers": 2,
+    }
+    with TestClient(app) as client:
+        response = client.post("/task", json=batch)
+        assert response.status_code == 200
+        client.post("/task", json=EVENT)
+    assert runs.events[0]["assets"] == batch["assets"]
+    assert runs.events[0]["max_workers"] == 2
+    # the fields that were not set are not in the event
+    assert runs.events[1] == EVENT
+
+
+def test_concurrent_requests(runs):
+    async def main():
+        async with lifespan(app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                return await asyncio.gather(
+                    *(client.post("/task", json=EVENT) for _ in range(300)),
+                    *(client.post("/task", json={**EVENT, "asset_id": 2}) for _ in range(300)),
+                )
+
+    responses = asyncio.run(main())
+    assert all(response.status_code == 200 for response in responses)
+    assert len(runs.events) == 2
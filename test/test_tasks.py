@@ -245,7 +245,7 @@ class TestTasks(unittest.TestCase):
                 "Missing items in the event: ['start_ts', 'end_ts', 'asset_id', 'task']",
             )
 
-    @patch("src.p03_1_app.boto3")
+    @patch("src.connections.boto3")
     def test_return_app_setting(self, boto3_mock) -> None:
         boto3_mock.resource().Object().get()[
             "Body"
@@ -274,7 +274,7 @@ class TestTasks(unittest.TestCase):
         }
         self.assertEqual(app_setting, expected_app_setting_data)
 
-    @patch("src.p03_1_app.boto3")
+    @patch("src.connections.boto3")
     def test_edit_app_setting(self, boto3_mock) -> None:
         start_ts = 1677112070
         end_ts = 1677115068
@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.model import Wits
+from src.wits_decoder import WitsRow, decode_wits
+
+RESOURCES_PATH = Path(__file__).parent / ".." / "resources"
+
+
+def pydantic_path(records):
+    return [
+        Wits.parse_wits(record)
+        for record in records
+        if Wits.check_fields(record) and Wits.check_activity(record)
+    ]
+
+
+@pytest.mark.parametrize("file_name", ["wits.json", "wits_not_all_fields_present.json"])
+def test_decode_wits_matches_pydantic_path(file_name):
+    with open(RESOURCES_PATH / file_name) as f:
+        records = json.load(f)
+    rows = list(decode_wits(records))
+    assert [row.to_wits() for row in rows] == pydantic_path(records)
+    assert len(rows) > 0
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        {"timestamp": 1, "activity": "circulating", "data": {}},
+        {"timestamp": 1, "activity": "rotary_drilling", "data": {"md": 1}},
+        {
+            "timestamp": 1,
+            "activity": "slide_drilling",
+            "data": {"md": 1, "wob": None, "rpm": 1, "rop": 1, "flowrate": 1},
+        },
+        {"timestamp": 1, "data": {"md": 1, "wob": 1, "rpm": 1, "rop": 1, "flowrate": 1}},
+    ],
+)
+def test_decode_wits_drops_invalid_records(record):
+    assert list(decode_wits([record])) == pydantic_path([record]) == []
+
+
+def test_decode_wits_coerces_types():
+    record = {
+        "timestamp": 1677112071,
+        "drill_string_id": "ds_1",
+        "activity": "rotary_drilling",
+        "data": {"md": 1, "wob": "2.5", "rpm": 3, "rop": 4, "flowrate": 5},
+    }
+    (row,) = decode_wits([record])
+    assert row == WitsRow(1677112071, "ds_1", 1.0, 2.5, 3.0, 4.0, 5.0)
+    assert row.to_wits() == pydantic_path([record])[0]
+    assert type(row.wob) is float